@@ -0,0 +1,340 @@
+"""
+Accès asynchrone (asyncio) à l'historique des conversations, avec son propre pool de connexions
+(psycopg 3), et façade synchrone pour le code bloquant
+Fichier: async_database.py
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+from datetime import timedelta
+
+from psycopg.rows import dict_row
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+
+# Sans psycopg2: seules les fonctions communes sont partagées avec database.py
+from db_common import (
+    SESSION_HISTORY_FIRST_SQL, SESSION_HISTORY_NEXT_SQL, USER_HISTORY_FIRST_SQL, USER_HISTORY_NEXT_SQL,
+    format_history, get_connection_params, history_cursor,
+)
+
+
+class AsyncChatHistoryDB:
+    """
+    Mêmes méthodes que ChatHistoryDB, en coroutines, sur un pool de connexions asynchrone.
+    Le pool est lié à la boucle d'événements qui l'ouvre: `await db.open()` (ou `async with db`)
+    avant la première requête, `await db.close()` à la fin.
+    Les tables sont créées par ChatHistoryDB.init_database.
+    """
+
+    def __init__(self, conn_params=None, min_size=None, max_size=None, timeout=None):
+        params = dict(conn_params or get_connection_params())
+        params['dbname'] = params.pop('database')
+        self.pool = AsyncConnectionPool(
+            kwargs=params,
+            min_size=int(os.getenv('DB_POOL_MIN', '1')) if min_size is None else min_size,
+            max_size=int(os.getenv('DB_POOL_MAX', '10')) if max_size is None else max_size,
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')) if timeout is None else timeout,
+            # Chaque connexion est vérifiée à la sortie du pool (redémarrage Postgres, timeout réseau...)
+            check=AsyncConnectionPool.check_connection,
+            name="chat-history-async",
+            open=False
+        )
+
+    async def open(self):
+        """Ouvre le pool (dans la boucle d'événements qui l'utilisera)"""
+        await self.pool.open()
+
+    async def close(self):
+        """Ferme toutes les connexions du pool"""
+        await self.pool.close()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def create_session(self, user_identifiant, user_name=None, user_role=None):
+        """Crée une nouvelle session de chat pour un utilisateur"""
+        try:
+            async with self.pool.connection() as conn:
+                cursor = await conn.execute("""
+                    INSERT INTO chat_sessions (user_identifiant, user_name, user_role)
+                    VALUES (%s, %s, %s)
+                    RETURNING id
+                """, (user_identifiant, user_name, user_role))
+                return (await cursor.fetchone())[0]
+        except Exception as e:
+            print(f"Erreur lors de la création de la session: {e}")
+            return None
+
+    async def get_active_session(self, user_identifiant):
+        """Récupère la session active d'un utilisateur ou en crée une nouvelle (une seule requête)"""
+        try:
+            async with self.pool.connection() as conn:
+                cursor = await conn.execute("SELECT get_or_create_chat_session(%s)", (user_identifiant,))
+                return (await cursor.fetchone())[0]
+        except Exception as e:
+            print(f"Erreur lors de la récupération de la session: {e}")
+            return None
+
+    async def save_turn(self, user_identifiant, messages, session_id=None, user_name=None, user_role=None):
+        """Enregistre un échange en un seul aller-retour (voir ChatHistoryDB.save_turn)"""
+        payload = [{'role': m['role'], 'content': m['content'], 'metadata': m.get('metadata')} for m in messages]
+        try:
+            async with self.pool.connection() as conn:
+                cursor = await conn.execute("SELECT save_chat_turn(%s, %s, %s, %s, %s)",
+                                            (user_identifiant, Jsonb(payload), session_id, user_name, user_role))
+                return (await cursor.fetchone())[0]
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement de l'échange: {e}")
+            return None
+
+    async def save_message(self, session_id, user_identifiant, role, content, metadata=None):
+        """Enregistre un message et met à jour la dernière activité et le nombre de messages de la session"""
+        try:
+            async with self.pool.connection() as conn:
+                await conn.execute("""
+                    INSERT INTO chat_messages
+                    (session_id, user_identifiant, role, content, metadata)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (session_id, user_identifiant, role, content, Jsonb(metadata) if metadata else None))
+
+                await conn.execute("""
+                    UPDATE chat_sessions
+                    SET last_activity = CURRENT_TIMESTAMP, message_count = message_count + 1
+                    WHERE id = %s
+                """, (session_id,))
+            return True
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement du message: {e}")
+            return False
+
+    async def insert_messages(self, rows):
+        """
+        Insère un lot de messages (session_id, user_identifiant, role, content, metadata) en une transaction,
+        dans l'ordre du lot et horodatés par le serveur, puis met à jour last_activity et message_count
+        une seule fois par session
+        """
+        counts = {}
+        for row in rows:
+            counts[row[0]] = counts.get(row[0], 0) + 1
+
+        try:
+            async with self.pool.connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany("""
+                        INSERT INTO chat_messages
+                        (session_id, user_identifiant, role, content, metadata)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """, [(session_id, user_identifiant, role, content, Jsonb(metadata) if metadata else None)
+                          for session_id, user_identifiant, role, content, metadata in rows])
+
+                    await cursor.executemany("""
+                        UPDATE chat_sessions
+                        SET last_activity = CURRENT_TIMESTAMP, message_count = message_count + %s
+                        WHERE id = %s
+                    """, [(count, session_id) for session_id, count in counts.items()])
+            return True
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement du lot de messages: {e}")
+            return False
+
+    async def get_user_history(self, user_identifiant, limit=50, session_id=None, cursor=None):
+        """
+        Récupère l'historique d'un utilisateur, une page à la fois (mêmes règles que
+        ChatHistoryDB.get_user_history: curseur (created_at, id) du dernier message de la page précédente)
+        """
+        if session_id:
+            query = SESSION_HISTORY_NEXT_SQL if cursor else SESSION_HISTORY_FIRST_SQL
+            params = (session_id,)
+        else:
+            query = USER_HISTORY_NEXT_SQL if cursor else USER_HISTORY_FIRST_SQL
+            params = (user_identifiant,)
+
+        try:
+            async with self.pool.connection() as conn:
+                async with conn.cursor(row_factory=dict_row) as db_cursor:
+                    await db_cursor.execute(query, params + tuple(cursor or ()) + (limit,))
+                    return await db_cursor.fetchall()
+        except Exception as e:
+            print(f"Erreur lors de la récupération de l'historique: {e}")
+            return []
+
+    history_cursor = staticmethod(history_cursor)
+
+    async def iter_user_history(self, user_identifiant, page_size=500, session_id=None):
+        """Parcourt tout l'historique page par page (async for)"""
+        cursor = None
+        while True:
+            messages = await self.get_user_history(user_identifiant, limit=page_size, session_id=session_id,
+                                                   cursor=cursor)
+            for message in messages:
+                yield message
+            if len(messages) < page_size:
+                return
+            cursor = self.history_cursor(messages)
+
+    async def get_user_sessions(self, user_identifiant, limit=10):
+        """Récupère la liste des sessions d'un utilisateur"""
+        try:
+            async with self.pool.connection() as conn:
+                async with conn.cursor(row_factory=dict_row) as cursor:
+                    await cursor.execute("""
+                        SELECT id, started_at, last_activity, is_active, message_count
+                        FROM chat_sessions
+                        WHERE user_identifiant = %s
+                        ORDER BY last_activity DESC
+                        LIMIT %s
+                    """, (user_identifiant, limit))
+                    return await cursor.fetchall()
+        except Exception as e:
+            print(f"Erreur lors de la récupération des sessions: {e}")
+            return []
+
+    async def format_history_for_ai(self, user_identifiant, max_messages=20):
+        """Formate l'historique pour le contexte de l'IA"""
+        return format_history(user_identifiant, await self.get_user_history(user_identifiant, limit=max_messages))
+
+    async def close_session(self, session_id):
+        """Marque une session comme inactive"""
+        try:
+            async with self.pool.connection() as conn:
+                await conn.execute("UPDATE chat_sessions SET is_active = FALSE WHERE id = %s", (session_id,))
+            return True
+        except Exception as e:
+            print(f"Erreur lors de la fermeture de la session: {e}")
+            return False
+
+    async def get_user_stats(self, user_identifiant):
+        """Récupère les statistiques d'utilisation d'un utilisateur"""
+        try:
+            async with self.pool.connection() as conn:
+                async with conn.cursor(row_factory=dict_row) as cursor:
+                    await cursor.execute("""
+                        SELECT
+                            COUNT(*) as total_sessions,
+                            COALESCE(SUM(message_count), 0) as total_messages,
+                            MIN(started_at) as first_session,
+                            MAX(last_activity) as last_activity
+                        FROM chat_sessions
+                        WHERE user_identifiant = %s
+                    """, (user_identifiant,))
+                    return await cursor.fetchone()
+        except Exception as e:
+            print(f"Erreur lors de la récupération des statistiques: {e}")
+            return None
+
+    async def get_cached_response(self, cache_key, max_age):
+        """Récupère une réponse en cache de moins de max_age secondes (et compte le succès)"""
+        try:
+            async with self.pool.connection() as conn:
+                cursor = await conn.execute("""
+                    UPDATE response_cache
+                    SET hits = hits + 1
+                    WHERE cache_key = %s
+                    AND created_at > NOW() - %s
+                    RETURNING response
+                """, (cache_key, timedelta(seconds=max_age)))
+                result = await cursor.fetchone()
+            return result[0] if result else None
+        except Exception as e:
+            print(f"Erreur lors de la lecture du cache de réponses: {e}")
+            return None
+
+    async def save_cached_response(self, cache_key, response):
+        """Enregistre (ou remplace) une réponse dans le cache"""
+        try:
+            async with self.pool.connection() as conn:
+                await conn.execute("""
+                    INSERT INTO response_cache (cache_key, response)
+                    VALUES (%s, %s)
+                    ON CONFLICT (cache_key) DO UPDATE
+                    SET response = EXCLUDED.response, created_at = CURRENT_TIMESTAMP, hits = 0
+                """, (cache_key, response))
+            return True
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement dans le cache de réponses: {e}")
+            return False
+
+    async def purge_response_cache(self, max_age):
+        """Supprime les réponses en cache de plus de max_age secondes"""
+        try:
+            async with self.pool.connection() as conn:
+                cursor = await conn.execute("""
+                    DELETE FROM response_cache
+                    WHERE created_at <= NOW() - %s
+                """, (timedelta(seconds=max_age),))
+                return cursor.rowcount
+        except Exception as e:
+            print(f"Erreur lors de la purge du cache de réponses: {e}")
+            return 0
+
+
+class SyncChatHistoryDB:
+    """
+    Façade synchrone d'AsyncChatHistoryDB: les coroutines s'exécutent sur une boucle d'événements
+    dédiée (thread de fond) qui possède le pool; tous les threads appelants la partagent.
+    - db.get_user_history(...) bloque jusqu'au résultat, comme ChatHistoryDB;
+    - db.submit('get_user_history', ...) retourne tout de suite un concurrent.futures.Future,
+      à attendre avec les autres tâches (météo, appel au modèle).
+    À créer une fois par processus (ex: st.cache_resource).
+    """
+
+    def __init__(self, timeout=30, **db_options):
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="chat-history-loop", daemon=True)
+        self._thread.start()
+        self.db = self._run(self._open(db_options))
+        atexit.register(self.close)
+
+    @staticmethod
+    async def _open(db_options):
+        db = AsyncChatHistoryDB(**db_options)
+        await db.open()
+        return db
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(self.timeout)
+
+    def submit(self, method, *args, **kwargs):
+        """Lance une méthode d'AsyncChatHistoryDB sans attendre son résultat (concurrent.futures.Future)"""
+        return asyncio.run_coroutine_threadsafe(getattr(self.db, method)(*args, **kwargs), self._loop)
+
+    def __getattr__(self, name):
+        if name == 'db':
+            raise AttributeError(name)
+        attribute = getattr(self.db, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return self.submit(name, *args, **kwargs).result(self.timeout)
+        call.__doc__ = attribute.__doc__
+        return call
+
+    def iter_user_history(self, user_identifiant, page_size=500, session_id=None):
+        """Parcourt tout l'historique page par page"""
+        cursor = None
+        while True:
+            messages = self.get_user_history(user_identifiant, limit=page_size, session_id=session_id,
+                                             cursor=cursor)
+            yield from messages
+            if len(messages) < page_size:
+                return
+            cursor = self.history_cursor(messages)
+
+    def close(self):
+        """Ferme le pool puis arrête la boucle d'événements"""
+        if not self._loop.is_running():
+            return
+        try:
+            self._run(self.db.close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(self.timeout)
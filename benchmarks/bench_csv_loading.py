@@ -0,0 +1,86 @@
+"""
+Banc d'essai du chargement des CSV: détection d'encodage en une lecture et types catégoriels
+(load_csv_with_encoding) comparés à l'ancienne boucle d'essais d'encodages de pd.read_csv.
+Les fichiers sont générés (capture_data.csv synthétique), le résultat est reproductible.
+
+Lancement (depuis la racine du projet):
+    PYTHONPATH=pages python benchmarks/bench_csv_loading.py --rows 1000000
+Fichier: benchmarks/bench_csv_loading.py
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_csv_with_encoding
+
+ZONES = ['Dakar', 'Saint-Louis', 'Mbour', 'Joal', 'Kayar', 'Ziguinchor']
+SPECIES = ['Thiof', 'Sardinelle', 'Capitaine', 'Dorade', 'Pageot', 'Merou', 'Sole']
+
+
+def legacy_load(file_path):
+    """Chargement d'origine: pd.read_csv relancé pour chaque encodage jusqu'au premier qui passe"""
+    for encoding in ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']:
+        try:
+            return pd.read_csv(file_path, encoding=encoding)
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def write_capture_csv(path, rows, encoding, seed=0):
+    """capture_data.csv synthétique; en latin-1, seule la dernière ligne contient un caractère accentué"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        'zone': rng.choice(ZONES, rows),
+        'espece': rng.choice(SPECIES, rows),
+        'quantite_kg': rng.integers(5, 500, rows),
+        'prix_unitaire_fcfa': rng.choice([1500, 5000, 6500, 7000, 8500], rows),
+        'pecheur': 'Moussa Diop',
+        'bateau': 'Pirogue-' + pd.Series(rng.integers(1, 99, rows)).astype(str),
+    })
+    if encoding == 'latin-1':
+        df.loc[rows - 1, 'pecheur'] = 'Mamadou Ndiaye Sénégal'
+    df.to_csv(path, index=False, encoding=encoding)
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        for encoding in ['utf-8', 'latin-1']:
+            path = os.path.join(folder, 'capture_data.csv')
+            write_capture_csv(path, args.rows, encoding)
+            size_mb = os.path.getsize(path) / 1e6
+
+            legacy_time, legacy_df = best_of(args.repeat, lambda: legacy_load(path))
+            new_time, new_df = best_of(args.repeat, lambda: load_csv_with_encoding(path))
+            assert legacy_df['pecheur'].iloc[-1] == new_df['pecheur'].iloc[-1]
+
+            legacy_mb = legacy_df.memory_usage(deep=True).sum() / 1e6
+            new_mb = new_df.memory_usage(deep=True).sum() / 1e6
+            print(f"{encoding:8} {size_mb:7.1f} Mo  lecture {legacy_time:6.2f} s -> {new_time:6.2f} s  "
+                  f"DataFrame {legacy_mb:7.1f} Mo -> {new_mb:7.1f} Mo")
+
+
+if __name__ == '__main__':
+    main()
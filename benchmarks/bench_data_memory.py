@@ -0,0 +1,69 @@
+"""
+Banc d'essai mémoire du magasin de données partagé: ce que coûtent N sessions quand chacune
+reçoit sa propre copie des données (comportement de st.cache_data, qui rend une copie désérialisée)
+comparé au magasin publié une seule fois (DataWatcher) où une session ne garde qu'un numéro de version.
+Mesure tracemalloc sur le dossier data du projet (ou --data), chargement compris: le chiffre du magasin
+partagé contient la copie publiée, celui des copies le résultat sérialisé gardé par le cache.
+
+Lancement (depuis la racine du projet):
+    PYTHONPATH=pages python benchmarks/bench_data_memory.py --sessions 1 10 100
+Fichier: benchmarks/bench_data_memory.py
+"""
+
+import argparse
+import os
+import pickle
+import tempfile
+import tracemalloc
+
+from data_store import DataWatcher
+
+
+def traced(build):
+    """Mémoire allouée (octets) par build(), l'objet construit restant vivant pendant la mesure"""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def publish_once(data_folder, snapshot_dir, count):
+    """Magasin partagé: une copie publiée par DataWatcher, chaque session ne garde que la version"""
+    watcher = DataWatcher(data_folder, snapshot_dir, poll_interval=0)
+    watcher.refresh()
+    return watcher, [{'data_version': watcher.current.version} for _ in range(count)]
+
+
+def copy_per_session(data_folder, snapshot_dir, count):
+    """st.cache_data: le résultat est conservé sérialisé, chaque session en désérialise sa propre copie"""
+    watcher = DataWatcher(data_folder, snapshot_dir, poll_interval=0)
+    watcher.refresh()
+    blob = pickle.dumps({name: dict(info) for name, info in watcher.current.data.items()})
+    del watcher
+    return blob, [pickle.loads(blob) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(__file__), '..', 'data'))
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        # Premier chargement hors mesure: les mesures suivantes relisent l'instantané, comme un redémarrage
+        watcher = DataWatcher(args.data, snapshot_dir, poll_interval=0)
+        watcher.refresh()
+        print(f"{len(watcher.current.data)} fichiers")
+        del watcher
+
+        for count in args.sessions:
+            copies = traced(lambda: copy_per_session(args.data, snapshot_dir, count))
+            shared = traced(lambda: publish_once(args.data, snapshot_dir, count))
+            print(f"{count:5} sessions: copies par session {copies / 2**20:8.1f} Mo, "
+                  f"magasin partagé (copie publiée comprise) {shared / 2**20:8.1f} Mo")
+
+
+if __name__ == '__main__':
+    main()
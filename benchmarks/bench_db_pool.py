@@ -0,0 +1,46 @@
+"""
+Banc d'essai du pool de connexions de ChatHistoryDB: débit de save_message avec une connexion
+ouverte par appel (use_pool=False) et avec le pool partagé (use_pool=True).
+Écrit dans la base désignée par DB_HOST/DB_PORT/DB_NAME/DB_USER/DB_PASSWORD: à lancer sur une base
+de test. La session créée (et ses messages) est supprimée à la fin.
+
+Lancement (depuis la racine du projet):
+    PYTHONPATH=. python benchmarks/bench_db_pool.py --messages 300
+Fichier: benchmarks/bench_db_pool.py
+"""
+
+import argparse
+import time
+
+from database import ChatHistoryDB
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=300)
+    args = parser.parse_args()
+
+    setup = ChatHistoryDB(use_pool=True, write_behind=False)
+    if not setup.init_database():
+        raise SystemExit("Base de données indisponible")
+    session_id = setup.create_session('bench_db_pool')
+
+    try:
+        for label, use_pool in [("connexion par appel", False), ("pool partagé", True)]:
+            db = ChatHistoryDB(use_pool=use_pool, write_behind=False)
+            db.save_message(session_id, 'bench_db_pool', 'user', 'échauffement')
+            start = time.perf_counter()
+            for i in range(args.messages):
+                db.save_message(session_id, 'bench_db_pool', 'user', f"message {i}")
+            elapsed = time.perf_counter() - start
+            print(f"{label:20} {args.messages / elapsed:8.0f} messages/s")
+    finally:
+        with setup.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM chat_sessions WHERE id = %s", (session_id,))
+            conn.commit()
+            cursor.close()
+
+
+if __name__ == '__main__':
+    main()
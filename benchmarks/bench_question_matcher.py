@@ -0,0 +1,47 @@
+"""
+Banc d'essai de l'analyse des questions: exactitude sur le jeu annoté des tests
+(tests/fixtures/questions.json) et temps moyen par question de analyze_question_type.
+
+Lancement (depuis la racine du projet):
+    PYTHONPATH=pages python benchmarks/bench_question_matcher.py --repeat 2000
+Fichier: benchmarks/bench_question_matcher.py
+"""
+
+import argparse
+import json
+import os
+import timeit
+
+from question_analysis import analyze_question_type
+
+NEEDS = ['needs_weather', 'needs_tide', 'needs_statistics', 'needs_species',
+         'needs_regulations', 'needs_platform_info', 'needs_comparison']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--questions', default=os.path.join(
+        os.path.dirname(__file__), '..', 'tests', 'fixtures', 'questions.json'))
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(args.questions, encoding='utf-8') as f:
+        cases = json.load(f)
+
+    correct = 0
+    for case in cases:
+        analysis = analyze_question_type(case['question'])
+        needs = {need for need in NEEDS if analysis[need]}
+        if needs == set(case['needs']) and analysis['cities'] == case['cities']:
+            correct += 1
+        else:
+            print(f"  erreur: {case['question']!r} -> {sorted(needs)} {analysis['cities']}")
+    print(f"exactitude {correct}/{len(cases)}")
+
+    questions = [case['question'] for case in cases]
+    seconds = timeit.timeit(lambda: [analyze_question_type(q) for q in questions], number=args.repeat)
+    print(f"{seconds / (args.repeat * len(questions)) * 1e6:.2f} µs/question")
+
+
+if __name__ == '__main__':
+    main()
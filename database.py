@@ -4,30 +4,284 @@ Fichier: database.py
 """
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import pool as pg_pool
+from psycopg2 import sql
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.extras import RealDictCursor, execute_values
+import atexit
+import gzip
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from dotenv import load_dotenv
 
-load_dotenv()
+# Réexportés: `from database import get_connection_params, format_history` reste valable
+from db_common import (
+    SESSION_HISTORY_SQL, USER_HISTORY_SQL, format_history, get_connection_params, history_cursor,
+)
+
+
+class ConnectionPool:
+    """
+    Pool de connexions thread-safe et borné (DB_POOL_MIN / DB_POOL_MAX).
+    Quand toutes les connexions sont prises, getconn() attend au plus DB_POOL_TIMEOUT
+    secondes au lieu d'échouer immédiatement. Chaque connexion est vérifiée à la sortie du pool.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=30.0, **conn_params):
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **conn_params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+
+    def getconn(self):
+        """Emprunte une connexion saine au pool"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pg_pool.PoolError("Aucune connexion disponible dans le pool")
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                # Connexion coupée (redémarrage Postgres, timeout réseau...) : on la remplace
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        """Rend une connexion au pool (fermée si elle est inutilisable)"""
+        try:
+            if not close and not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            close = True
+        try:
+            self._pool.putconn(conn, close=close or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        """Ferme toutes les connexions du pool"""
+        self._pool.closeall()
+
+    @staticmethod
+    def _is_healthy(conn):
+        if conn.closed:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+
+# Pools partagés par toutes les sessions Streamlit du processus, un par jeu de paramètres
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(conn_params):
+    """Retourne le pool partagé pour ces paramètres de connexion (créé au premier appel)"""
+    key = tuple(sorted(conn_params.items()))
+    with _pools_lock:
+        db_pool = _pools.get(key)
+        if db_pool is None:
+            db_pool = ConnectionPool(
+                int(os.getenv('DB_POOL_MIN', '1')),
+                int(os.getenv('DB_POOL_MAX', '10')),
+                timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+                **conn_params
+            )
+            _pools[key] = db_pool
+        return db_pool
+
+
+class MessageWriteQueue:
+    """
+    File d'écriture différée (write-behind) pour les messages du chat.
+    Les messages sont mis en file et un thread de fond les insère par lots
+    (INSERT multi-lignes + une seule mise à jour de last_activity par session).
+    L'horodatage des messages est celui du serveur à l'insertion (comme pour les écritures directes):
+    les lignes d'un lot sont insérées dans l'ordre de la file, l'id départage les messages d'un même lot.
+    La file est bornée : put() retourne False quand elle est pleine et l'appelant
+    écrit alors de façon synchrone. Les messages restants sont vidés à l'arrêt du processus.
+    Chaque message reçoit un numéro d'ordre: flush() n'attend que les messages mis en file avant
+    son appel, pas ceux que les autres sessions ajoutent pendant l'attente.
+    """
+
+    def __init__(self, db, maxsize=1000, batch_size=100, flush_interval=0.5, flush_timeout=5.0):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_timeout = flush_timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._queued = 0    # numéro du dernier message mis en file
+        self._written = 0   # numéro du dernier message traité (la file est vidée dans l'ordre)
+        self._progress = threading.Condition()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def put(self, session_id, user_identifiant, role, content, metadata=None):
+        """Met un message en file, retourne False si la file est pleine ou arrêtée"""
+        if self._stop.is_set():
+            return False
+        with self._progress:
+            try:
+                self._queue.put_nowait((self._queued + 1, (session_id, user_identifiant, role, content, metadata)))
+            except queue.Full:
+                return False
+            self._queued += 1
+        return True
+
+    def flush(self, timeout=None):
+        """
+        Attend que les messages mis en file avant l'appel soient écrits, au plus `timeout` secondes
+        (flush_timeout par défaut). Returns: False si l'échéance est dépassée (base indisponible...)
+        """
+        deadline = time.monotonic() + (self.flush_timeout if timeout is None else timeout)
+        with self._progress:
+            target = self._queued
+            while self._written < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._progress.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        """Arrête le thread de fond après avoir vidé la file"""
+        self._stop.set()
+        self._worker.join(timeout)
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        rows = [row for _, row in batch]
+        try:
+            if not self.db.insert_messages(rows):
+                # Le lot a échoué : on réessaie message par message, dans l'ordre de la file,
+                # pour ne perdre que les lignes invalides
+                for session_id, user_identifiant, role, content, metadata in rows:
+                    self.db.save_message(session_id, user_identifiant, role, content, metadata)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+            with self._progress:
+                self._written = batch[-1][0]
+                self._progress.notify_all()
+
+
+# Files d'écriture partagées par le processus, une par jeu de paramètres de connexion
+_write_queues = {}
+_write_queues_lock = threading.Lock()
+
+
+def get_write_queue(conn_params, use_pool=True):
+    """Retourne la file d'écriture différée partagée pour ces paramètres de connexion"""
+    key = tuple(sorted(conn_params.items()))
+    with _write_queues_lock:
+        write_queue = _write_queues.get(key)
+        if write_queue is None:
+            write_queue = MessageWriteQueue(
+                ChatHistoryDB(use_pool=use_pool, write_behind=False),
+                maxsize=int(os.getenv('DB_WRITE_QUEUE_SIZE', '1000')),
+                batch_size=int(os.getenv('DB_WRITE_BATCH_SIZE', '100')),
+                flush_interval=float(os.getenv('DB_WRITE_FLUSH_INTERVAL', '0.5')),
+                flush_timeout=float(os.getenv('DB_WRITE_FLUSH_TIMEOUT', '5'))
+            )
+            _write_queues[key] = write_queue
+        return write_queue
+
+
+# Partitionnement mensuel de chat_messages (DB_PARTITIONED=1): une table par mois, plus une partition
+# par défaut qui reçoit les messages d'un mois dont la partition n'a pas encore été créée
+DEFAULT_PARTITION = 'chat_messages_default'
+PARTITION_PATTERN = r'^chat_messages_p[0-9]{6}$'
+
+
+def _month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Nom de la partition d'un mois (ex: chat_messages_p202410)"""
+    return f"chat_messages_p{month:%Y%m}"
+
 
 class ChatHistoryDB:
-    def __init__(self):
-        self.conn_params = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', '5432'),
-            'database': os.getenv('DB_NAME', 'sunupechenet'),
-            'user': os.getenv('DB_USER', 'postgres'),
-            'password': os.getenv('DB_PASSWORD', 'your_password')
-        }
+    def __init__(self, use_pool=None, write_behind=None, partitioned=None):
+        self.conn_params = get_connection_params()
+        if use_pool is None:
+            use_pool = os.getenv('DB_POOL_ENABLED', '1') != '0'
+        self.use_pool = use_pool
+        if write_behind is None:
+            write_behind = os.getenv('DB_WRITE_BEHIND', '0') == '1'
+        self.write_queue = get_write_queue(self.conn_params, use_pool) if write_behind else None
+        if partitioned is None:
+            partitioned = os.getenv('DB_PARTITIONED', '0') == '1'
+        self.partitioned = partitioned
 
     def get_connection(self):
         """Établit une connexion à la base de données"""
         return psycopg2.connect(**self.conn_params)
 
+    @contextmanager
+    def connection(self):
+        """Fournit une connexion (empruntée au pool partagé, ou dédiée si le pool est désactivé)"""
+        if not self.use_pool:
+            conn = self.get_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+
+        db_pool = get_pool(self.conn_params)
+        conn = db_pool.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            db_pool.putconn(conn, close=broken)
+
     def init_database(self):
-        """Crée les tables nécessaires si elles n'existent pas"""
-        create_tables_sql = """
+        """
+        Crée les tables nécessaires si elles n'existent pas.
+        Avec DB_PARTITIONED=1, chat_messages est partitionnée par mois (une table existante non
+        partitionnée est migrée) et les partitions des prochains mois sont créées.
+        """
+        create_sessions_sql = """
         -- Table pour stocker les sessions de chat
         CREATE TABLE IF NOT EXISTS chat_sessions (
             id SERIAL PRIMARY KEY,
@@ -36,9 +290,12 @@ class ChatHistoryDB:
             user_role VARCHAR(50),
             started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT TRUE
+            is_active BOOLEAN DEFAULT TRUE,
+            message_count INTEGER NOT NULL DEFAULT 0 -- Tenu à jour à chaque insertion de messages
         );
+        """
 
+        create_messages_sql = """
         -- Table pour stocker les messages
         CREATE TABLE IF NOT EXISTS chat_messages (
             id SERIAL PRIMARY KEY,
@@ -49,43 +306,336 @@ class ChatHistoryDB:
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             metadata JSONB -- Pour stocker des infos supplémentaires
         );
+        """
 
-        -- Index pour améliorer les performances
-        CREATE INDEX IF NOT EXISTS idx_sessions_user ON chat_sessions(user_identifiant);
-        CREATE INDEX IF NOT EXISTS idx_messages_session ON chat_messages(session_id);
-        CREATE INDEX IF NOT EXISTS idx_messages_user ON chat_messages(user_identifiant);
+        create_indexes_sql = """
+        -- Migration des bases existantes: compteur de messages par session, initialisé une seule fois
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                AND table_name = 'chat_sessions' AND column_name = 'message_count'
+            ) THEN
+                ALTER TABLE chat_sessions ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0;
+                UPDATE chat_sessions cs
+                SET message_count = m.total
+                FROM (SELECT session_id, COUNT(*) AS total FROM chat_messages GROUP BY session_id) m
+                WHERE cs.id = m.session_id;
+            END IF;
+        END $$;
+
+        -- Index composites calqués sur les requêtes (filtre d'égalité puis tri, id pour la pagination)
+        CREATE INDEX IF NOT EXISTS idx_sessions_user_activity
+            ON chat_sessions(user_identifiant, last_activity DESC);
+        CREATE INDEX IF NOT EXISTS idx_messages_session_created
+            ON chat_messages(session_id, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_messages_user_created
+            ON chat_messages(user_identifiant, created_at DESC, id DESC);
         CREATE INDEX IF NOT EXISTS idx_messages_created ON chat_messages(created_at);
+
+        -- Remplacés par les index composites ci-dessus
+        DROP INDEX IF EXISTS idx_sessions_user;
+        DROP INDEX IF EXISTS idx_messages_session;
+        DROP INDEX IF EXISTS idx_messages_user;
+
+        -- Cache des réponses du chatbot, partagé entre les instances de l'application
+        CREATE TABLE IF NOT EXISTS response_cache (
+            cache_key VARCHAR(64) PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            hits INTEGER DEFAULT 0
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_response_cache_created ON response_cache(created_at);
+        """
+
+        create_functions_sql = """
+        -- Session active d'un utilisateur (moins de 24h d'inactivité), créée si besoin.
+        -- Le verrou consultatif (libéré à la fin de la transaction) empêche deux onglets
+        -- de créer chacun une session en même temps.
+        CREATE OR REPLACE FUNCTION get_or_create_chat_session(
+            p_user_identifiant VARCHAR,
+            p_session_id INTEGER DEFAULT NULL,
+            p_user_name VARCHAR DEFAULT NULL,
+            p_user_role VARCHAR DEFAULT NULL
+        ) RETURNS INTEGER AS $$
+        DECLARE
+            v_session_id INTEGER;
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext('chat_sessions:' || p_user_identifiant));
+
+            -- Session connue de l'appelant, si elle est toujours active
+            IF p_session_id IS NOT NULL THEN
+                SELECT id INTO v_session_id
+                FROM chat_sessions
+                WHERE id = p_session_id
+                AND user_identifiant = p_user_identifiant
+                AND is_active = TRUE
+                AND last_activity > NOW() - INTERVAL '24 hours';
+            END IF;
+
+            -- Sinon (session fermée ou expirée) la dernière session active de l'utilisateur
+            IF v_session_id IS NULL THEN
+                SELECT id INTO v_session_id
+                FROM chat_sessions
+                WHERE user_identifiant = p_user_identifiant
+                AND is_active = TRUE
+                AND last_activity > NOW() - INTERVAL '24 hours'
+                ORDER BY last_activity DESC
+                LIMIT 1;
+            END IF;
+
+            IF v_session_id IS NULL THEN
+                INSERT INTO chat_sessions (user_identifiant, user_name, user_role)
+                VALUES (p_user_identifiant, p_user_name, p_user_role)
+                RETURNING id INTO v_session_id;
+            END IF;
+            RETURN v_session_id;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Un échange complet en une instruction: session résolue (ou créée), messages insérés
+        -- dans l'ordre du tableau JSON [{role, content, metadata}], last_activity et message_count mis à jour
+        CREATE OR REPLACE FUNCTION save_chat_turn(
+            p_user_identifiant VARCHAR,
+            p_messages JSONB,
+            p_session_id INTEGER DEFAULT NULL,
+            p_user_name VARCHAR DEFAULT NULL,
+            p_user_role VARCHAR DEFAULT NULL
+        ) RETURNS INTEGER AS $$
+        DECLARE
+            v_session_id INTEGER;
+            v_count INTEGER;
+        BEGIN
+            v_session_id := get_or_create_chat_session(p_user_identifiant, p_session_id, p_user_name, p_user_role);
+
+            INSERT INTO chat_messages (session_id, user_identifiant, role, content, metadata)
+            SELECT v_session_id, p_user_identifiant, m.value->>'role', m.value->>'content',
+                   NULLIF(m.value->'metadata', 'null'::jsonb)
+            FROM jsonb_array_elements(p_messages) WITH ORDINALITY AS m(value, position)
+            ORDER BY m.position;
+            GET DIAGNOSTICS v_count = ROW_COUNT;
+
+            UPDATE chat_sessions
+            SET last_activity = CURRENT_TIMESTAMP, message_count = message_count + v_count
+            WHERE id = v_session_id;
+            RETURN v_session_id;
+        END;
+        $$ LANGUAGE plpgsql;
         """
 
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(create_tables_sql)
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(create_sessions_sql)
+                if self.partitioned:
+                    self._create_partitioned_messages(cursor)
+                else:
+                    cursor.execute(create_messages_sql)
+                cursor.execute(create_indexes_sql)
+                cursor.execute(create_functions_sql)
+                conn.commit()
+                cursor.close()
             print("✅ Tables créées avec succès")
             return True
         except Exception as e:
             print(f"❌ Erreur lors de la création des tables: {e}")
             return False
 
+    def _create_partitioned_messages(self, cursor):
+        """
+        Crée chat_messages partitionnée par mois. Une table chat_messages ordinaire existante est migrée
+        dans la même transaction: renommée, recopiée dans les partitions (ids conservés) puis supprimée.
+        Les index sont créés ensuite sur la table partitionnée (create_indexes_sql), après la copie.
+        """
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('chat_messages')")
+        row = cursor.fetchone()
+        if row is not None and row[0] == 'p':
+            self._ensure_partitions(cursor)
+            return
+
+        legacy = row is not None
+        if legacy:
+            # Libérer les noms de la clé primaire et des index pour la nouvelle table
+            cursor.execute("""
+                ALTER TABLE chat_messages RENAME TO chat_messages_legacy;
+                ALTER TABLE chat_messages_legacy RENAME CONSTRAINT chat_messages_pkey TO chat_messages_legacy_pkey;
+                DROP INDEX IF EXISTS idx_messages_session_created, idx_messages_user_created,
+                    idx_messages_created, idx_messages_session, idx_messages_user;
+            """)
+
+        # La clé primaire d'une table partitionnée doit contenir la clé de partitionnement.
+        # La séquence existante (SERIAL de l'ancienne table) est réutilisée: les ids continuent.
+        cursor.execute(sql.SQL("""
+            CREATE SEQUENCE IF NOT EXISTS chat_messages_id_seq;
+            CREATE TABLE chat_messages (
+                id INTEGER NOT NULL DEFAULT nextval('chat_messages_id_seq'),
+                session_id INTEGER REFERENCES chat_sessions(id) ON DELETE CASCADE,
+                user_identifiant VARCHAR(100) NOT NULL,
+                role VARCHAR(20) NOT NULL, -- 'user' ou 'assistant'
+                content TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                metadata JSONB, -- Pour stocker des infos supplémentaires
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at);
+            ALTER SEQUENCE chat_messages_id_seq OWNED BY chat_messages.id;
+            CREATE TABLE {} PARTITION OF chat_messages DEFAULT;
+        """).format(sql.Identifier(DEFAULT_PARTITION)))
+
+        first_month = None
+        if legacy:
+            cursor.execute("SELECT MIN(created_at) FROM chat_messages_legacy")
+            first_month = cursor.fetchone()[0]
+        self._ensure_partitions(cursor, first_month)
+
+        if legacy:
+            cursor.execute("""
+                INSERT INTO chat_messages (id, session_id, user_identifiant, role, content, created_at, metadata)
+                SELECT id, session_id, user_identifiant, role, content,
+                       COALESCE(created_at, CURRENT_TIMESTAMP), metadata
+                FROM chat_messages_legacy
+            """)
+            migrated = cursor.rowcount
+            cursor.execute("DROP TABLE chat_messages_legacy")
+            print(f"✅ chat_messages migrée vers des partitions mensuelles ({migrated} messages)")
+
+    @staticmethod
+    def _current_month(cursor):
+        """
+        Premier jour du mois courant selon l'horloge du serveur PostgreSQL, celle qui remplit
+        created_at (CURRENT_TIMESTAMP): les bornes des partitions ne dépendent pas de l'horloge de l'application
+        """
+        cursor.execute("SELECT date_trunc('month', now()::timestamp)")
+        return cursor.fetchone()[0]
+
+    def _ensure_partitions(self, cursor, first_month=None, months_ahead=None):
+        """
+        Crée les partitions manquantes de first_month (mois courant par défaut) jusqu'à months_ahead mois
+        après le mois courant du serveur.
+        Les messages déjà reçus par la partition par défaut pour ce mois y sont déplacés avant l'attachement.
+        """
+        if months_ahead is None:
+            months_ahead = int(os.getenv('DB_PARTITION_MONTHS_AHEAD', '2'))
+        current_month = self._current_month(cursor)
+        month = current_month if first_month is None else min(_month_start(first_month), current_month)
+        last_month = _add_months(current_month, months_ahead)
+        created = []
+        while month <= last_month:
+            name = partition_name(month)
+            cursor.execute("SELECT to_regclass(%s)", (name,))
+            if cursor.fetchone()[0] is None:
+                bounds = (month, _add_months(month, 1))
+                partition, default = sql.Identifier(name), sql.Identifier(DEFAULT_PARTITION)
+                cursor.execute(sql.SQL("""
+                    CREATE TABLE {partition} (LIKE chat_messages INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+                    WITH moved AS (
+                        DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *
+                    )
+                    INSERT INTO {partition} SELECT * FROM moved;
+                    ALTER TABLE chat_messages ATTACH PARTITION {partition} FOR VALUES FROM (%s) TO (%s);
+                """).format(partition=partition, default=default), bounds + bounds)
+                created.append(name)
+            month = _add_months(month, 1)
+        return created
+
+    def maintain_partitions(self, retention_months=None, archive_dir=None):
+        """
+        Maintenance périodique de chat_messages partitionnée (`python database.py`, lancée chaque jour
+        par le service db_maintenance de docker-compose.yml):
+        crée les partitions des prochains mois, puis archive les mois plus anciens que la durée
+        de rétention (DB_RETENTION_MONTHS, 0 = conservation illimitée): chaque partition est détachée,
+        exportée en CSV compressé dans archive_dir (DB_ARCHIVE_DIR), puis supprimée.
+        Returns: liste des fichiers d'archive écrits
+        """
+        if retention_months is None:
+            retention_months = int(os.getenv('DB_RETENTION_MONTHS', '0'))
+        if archive_dir is None:
+            archive_dir = os.getenv('DB_ARCHIVE_DIR', 'archives')
+
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                self._ensure_partitions(cursor)
+                current_month = self._current_month(cursor)
+                conn.commit()
+
+                # Partitions mensuelles, attachées ou détachées par une maintenance interrompue
+                cursor.execute("""
+                    SELECT relname, relispartition FROM pg_class
+                    WHERE relkind = 'r' AND relnamespace = current_schema()::regnamespace
+                    AND relname ~ %s
+                    ORDER BY relname
+                """, (PARTITION_PATTERN,))
+                partitions = cursor.fetchall()
+                cursor.close()
+        except Exception as e:
+            print(f"Erreur lors de la maintenance des partitions: {e}")
+            return []
+
+        if retention_months <= 0:
+            return []
+
+        cutoff = _add_months(current_month, -retention_months)
+        archived = []
+        for name, attached in partitions:
+            month = datetime.strptime(name[-6:], '%Y%m')
+            if _add_months(month, 1) <= cutoff:
+                path = self._archive_partition(name, attached, archive_dir)
+                if path is None:
+                    break
+                archived.append(path)
+        return archived
+
+    def _archive_partition(self, name, attached, archive_dir):
+        """Détache une partition, l'exporte en CSV gzip puis la supprime (None en cas d'erreur)"""
+        partition = sql.Identifier(name)
+        path = os.path.join(archive_dir, f"{name}.csv.gz")
+        try:
+            os.makedirs(archive_dir, exist_ok=True)
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                if attached:
+                    cursor.execute(sql.SQL("ALTER TABLE chat_messages DETACH PARTITION {}").format(partition))
+                    conn.commit()
+
+                # Écriture dans un fichier temporaire: l'archive n'apparaît que complète
+                with gzip.open(path + ".tmp", 'wb') as archive:
+                    cursor.copy_expert(sql.SQL(
+                        "COPY (SELECT * FROM {} ORDER BY created_at, id) TO STDOUT WITH CSV HEADER"
+                    ).format(partition), archive)
+                os.replace(path + ".tmp", path)
+
+                # Les messages archivés ne sont plus comptés dans leurs sessions
+                cursor.execute(sql.SQL("""
+                    UPDATE chat_sessions cs
+                    SET message_count = GREATEST(cs.message_count - m.total, 0)
+                    FROM (SELECT session_id, COUNT(*) AS total FROM {0} GROUP BY session_id) m
+                    WHERE cs.id = m.session_id;
+                    DROP TABLE {0};
+                """).format(partition))
+                conn.commit()
+                cursor.close()
+            return path
+        except Exception as e:
+            print(f"Erreur lors de l'archivage de la partition {name}: {e}")
+            return None
+
     def create_session(self, user_identifiant, user_name=None, user_role=None):
         """Crée une nouvelle session de chat pour un utilisateur"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute("""
-                INSERT INTO chat_sessions (user_identifiant, user_name, user_role)
-                VALUES (%s, %s, %s)
-                RETURNING id
-            """, (user_identifiant, user_name, user_role))
+                cursor.execute("""
+                    INSERT INTO chat_sessions (user_identifiant, user_name, user_role)
+                    VALUES (%s, %s, %s)
+                    RETURNING id
+                """, (user_identifiant, user_name, user_role))
 
-            session_id = cursor.fetchone()[0]
-            conn.commit()
-            cursor.close()
-            conn.close()
+                session_id = cursor.fetchone()[0]
+                conn.commit()
+                cursor.close()
 
             return session_id
         except Exception as e:
@@ -93,124 +643,190 @@ class ChatHistoryDB:
             return None
 
     def get_active_session(self, user_identifiant):
-        """Récupère la session active d'un utilisateur ou en crée une nouvelle"""
+        """
+        Récupère la session active d'un utilisateur ou en crée une nouvelle
+        (une seule requête, sans doublon quand deux onglets la demandent en même temps)
+        """
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            with self.connection() as conn:
+                cursor = conn.cursor()
 
-            # Chercher une session active récente (moins de 24h)
-            cursor.execute("""
-                SELECT id FROM chat_sessions
-                WHERE user_identifiant = %s
-                AND is_active = TRUE
-                AND last_activity > NOW() - INTERVAL '24 hours'
-                ORDER BY last_activity DESC
-                LIMIT 1
-            """, (user_identifiant,))
+                cursor.execute("SELECT get_or_create_chat_session(%s)", (user_identifiant,))
 
-            result = cursor.fetchone()
-            cursor.close()
-            conn.close()
+                session_id = cursor.fetchone()[0]
+                conn.commit()
+                cursor.close()
 
-            if result:
-                return result['id']
-            else:
-                # Créer une nouvelle session
-                return self.create_session(user_identifiant)
+            return session_id
         except Exception as e:
             print(f"Erreur lors de la récupération de la session: {e}")
             return None
 
-    def save_message(self, session_id, user_identifiant, role, content, metadata=None):
-        """Enregistre un message dans l'historique"""
+    def save_turn(self, user_identifiant, messages, session_id=None, user_name=None, user_role=None):
+        """
+        Enregistre un échange (ex: question puis réponse) en un seul aller-retour: la session active
+        est retrouvée ou créée, les messages insérés et la session mise à jour dans la même transaction.
+        messages: liste de dicts {'role', 'content', 'metadata' (optionnel)}
+        session_id: session connue de l'appelant, réutilisée si elle est toujours active
+        (sinon la dernière session active de l'utilisateur, ou une nouvelle)
+        Returns: id de la session utilisée, ou None en cas d'erreur
+        """
+        if self.write_queue is not None:
+            # Les messages encore en file (save_message) sont écrits avant l'échange: ils restent plus anciens
+            if not self.write_queue.flush():
+                print("Écritures en attente non terminées: l'échange peut précéder des messages en file")
+
+        payload = [{'role': m['role'], 'content': m['content'], 'metadata': m.get('metadata')} for m in messages]
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute("""
-                INSERT INTO chat_messages
-                (session_id, user_identifiant, role, content, metadata)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (session_id, user_identifiant, role, content,
-                  psycopg2.extras.Json(metadata) if metadata else None))
+                cursor.execute("SELECT save_chat_turn(%s, %s, %s, %s, %s)",
+                               (user_identifiant, psycopg2.extras.Json(payload), session_id, user_name, user_role))
 
-            # Mettre à jour la dernière activité de la session
-            cursor.execute("""
-                UPDATE chat_sessions
-                SET last_activity = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, (session_id,))
+                session_id = cursor.fetchone()[0]
+                conn.commit()
+                cursor.close()
 
-            conn.commit()
-            cursor.close()
-            conn.close()
+            return session_id
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement de l'échange: {e}")
+            return None
+
+    def save_message(self, session_id, user_identifiant, role, content, metadata=None):
+        """Enregistre un message dans l'historique (en différé si la file d'écriture est active)"""
+        if self.write_queue is not None and self.write_queue.put(session_id, user_identifiant, role, content, metadata):
+            return True
+
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    INSERT INTO chat_messages
+                    (session_id, user_identifiant, role, content, metadata)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (session_id, user_identifiant, role, content,
+                      psycopg2.extras.Json(metadata) if metadata else None))
+
+                # Mettre à jour la dernière activité et le nombre de messages de la session
+                cursor.execute("""
+                    UPDATE chat_sessions
+                    SET last_activity = CURRENT_TIMESTAMP, message_count = message_count + 1
+                    WHERE id = %s
+                """, (session_id,))
+
+                conn.commit()
+                cursor.close()
             return True
         except Exception as e:
             print(f"Erreur lors de l'enregistrement du message: {e}")
             return False
 
-    def get_user_history(self, user_identifiant, limit=50, session_id=None):
-        """Récupère l'historique des conversations d'un utilisateur"""
+    def insert_messages(self, rows):
+        """
+        Insère un lot de messages (session_id, user_identifiant, role, content, metadata) en une requête,
+        dans l'ordre du lot et horodatés par le serveur, puis met à jour last_activity et message_count
+        une seule fois par session
+        """
+        counts = {}
+        for row in rows:
+            counts[row[0]] = counts.get(row[0], 0) + 1
+
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-            if session_id:
-                # Récupérer l'historique d'une session spécifique
-                query = """
-                    SELECT role, content, created_at, metadata
-                    FROM chat_messages
-                    WHERE session_id = %s
-                    ORDER BY created_at ASC
-                    LIMIT %s
-                """
-                cursor.execute(query, (session_id, limit))
-            else:
-                # Récupérer l'historique général de l'utilisateur
-                query = """
-                    SELECT cm.role, cm.content, cm.created_at, cm.metadata,
-                           cs.started_at as session_start
-                    FROM chat_messages cm
-                    JOIN chat_sessions cs ON cm.session_id = cs.id
-                    WHERE cm.user_identifiant = %s
-                    ORDER BY cm.created_at DESC
-                    LIMIT %s
-                """
-                cursor.execute(query, (user_identifiant, limit))
+            with self.connection() as conn:
+                cursor = conn.cursor()
+
+                execute_values(cursor, """
+                    INSERT INTO chat_messages
+                    (session_id, user_identifiant, role, content, metadata)
+                    VALUES %s
+                """, [(session_id, user_identifiant, role, content,
+                       psycopg2.extras.Json(metadata) if metadata else None)
+                      for session_id, user_identifiant, role, content, metadata in rows],
+                    page_size=max(len(rows), 1))
+
+                execute_values(cursor, """
+                    UPDATE chat_sessions cs
+                    SET last_activity = CURRENT_TIMESTAMP,
+                        message_count = cs.message_count + v.message_count
+                    FROM (VALUES %s) AS v(id, message_count)
+                    WHERE cs.id = v.id
+                """, list(counts.items()))
+
+                conn.commit()
+                cursor.close()
+            return True
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement du lot de messages: {e}")
+            return False
 
-            messages = cursor.fetchall()
-            cursor.close()
-            conn.close()
+    def get_user_history(self, user_identifiant, limit=50, session_id=None, cursor=None):
+        """
+        Récupère l'historique des conversations d'un utilisateur, une page à la fois.
+        Pagination par curseur (keyset): `cursor` est le (created_at, id) du dernier message de la page
+        précédente (voir history_cursor). Une session est lue dans l'ordre chronologique,
+        l'historique général du plus récent au plus ancien.
+        """
+        if self.write_queue is not None:
+            # Lire ses propres écritures : les messages encore en file doivent être visibles
+            if not self.write_queue.flush():
+                print("Écritures en attente non terminées: l'historique peut être incomplet")
+
+        try:
+            with self.connection() as conn:
+                db_cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+                if session_id:
+                    # Récupérer l'historique d'une session spécifique (index session_id, created_at, id)
+                    query = SESSION_HISTORY_SQL
+                    params = (session_id,)
+                else:
+                    # Récupérer l'historique général de l'utilisateur (index user_identifiant, created_at, id)
+                    query = USER_HISTORY_SQL
+                    params = (user_identifiant,)
+
+                created_at, message_id = cursor if cursor else (None, None)
+                db_cursor.execute(query, params + (created_at, created_at, message_id, limit))
+
+                messages = db_cursor.fetchall()
+                db_cursor.close()
 
             return messages
         except Exception as e:
             print(f"Erreur lors de la récupération de l'historique: {e}")
             return []
 
+    # Curseur de la page suivante: (created_at, id) du dernier message d'une page
+    history_cursor = staticmethod(history_cursor)
+
+    def iter_user_history(self, user_identifiant, page_size=500, session_id=None):
+        """Parcourt tout l'historique page par page (export, analyses) sans OFFSET ni chargement complet"""
+        cursor = None
+        while True:
+            messages = self.get_user_history(user_identifiant, limit=page_size, session_id=session_id,
+                                             cursor=cursor)
+            yield from messages
+            if len(messages) < page_size:
+                return
+            cursor = self.history_cursor(messages)
+
     def get_user_sessions(self, user_identifiant, limit=10):
-        """Récupère la liste des sessions d'un utilisateur"""
+        """Récupère la liste des sessions d'un utilisateur (nombre de messages dénormalisé, sans jointure)"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            with self.connection() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+                cursor.execute("""
+                    SELECT id, started_at, last_activity, is_active, message_count
+                    FROM chat_sessions
+                    WHERE user_identifiant = %s
+                    ORDER BY last_activity DESC
+                    LIMIT %s
+                """, (user_identifiant, limit))
 
-            cursor.execute("""
-                SELECT
-                    cs.id,
-                    cs.started_at,
-                    cs.last_activity,
-                    cs.is_active,
-                    COUNT(cm.id) as message_count
-                FROM chat_sessions cs
-                LEFT JOIN chat_messages cm ON cs.id = cm.session_id
-                WHERE cs.user_identifiant = %s
-                GROUP BY cs.id
-                ORDER BY cs.last_activity DESC
-                LIMIT %s
-            """, (user_identifiant, limit))
-
-            sessions = cursor.fetchall()
-            cursor.close()
-            conn.close()
+                sessions = cursor.fetchall()
+                cursor.close()
 
             return sessions
         except Exception as e:
@@ -219,38 +835,22 @@ class ChatHistoryDB:
 
     def format_history_for_ai(self, user_identifiant, max_messages=20):
         """Formate l'historique pour le contexte de l'IA"""
-        messages = self.get_user_history(user_identifiant, limit=max_messages)
-
-        if not messages:
-            return ""
-
-        context = "\n=== HISTORIQUE DES CONVERSATIONS PRÉCÉDENTES ===\n\n"
-        context += f"Utilisateur: {user_identifiant}\n"
-        context += f"Nombre de messages récents: {len(messages)}\n\n"
-
-        for msg in reversed(messages):  # Inverser pour avoir l'ordre chronologique
-            timestamp = msg['created_at'].strftime("%d/%m/%Y %H:%M")
-            role_label = "Utilisateur" if msg['role'] == 'user' else "Assistant"
-            context += f"[{timestamp}] {role_label}: {msg['content']}\n\n"
-
-        context += "=== FIN DE L'HISTORIQUE ===\n\n"
-        return context
+        return format_history(user_identifiant, self.get_user_history(user_identifiant, limit=max_messages))
 
     def close_session(self, session_id):
         """Marque une session comme inactive"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self.connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute("""
-                UPDATE chat_sessions
-                SET is_active = FALSE
-                WHERE id = %s
-            """, (session_id,))
+                cursor.execute("""
+                    UPDATE chat_sessions
+                    SET is_active = FALSE
+                    WHERE id = %s
+                """, (session_id,))
 
-            conn.commit()
-            cursor.close()
-            conn.close()
+                conn.commit()
+                cursor.close()
             return True
         except Exception as e:
             print(f"Erreur lors de la fermeture de la session: {e}")
@@ -259,25 +859,109 @@ class ChatHistoryDB:
     def get_user_stats(self, user_identifiant):
         """Récupère les statistiques d'utilisation d'un utilisateur"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-            cursor.execute("""
-                SELECT
-                    COUNT(DISTINCT cs.id) as total_sessions,
-                    COUNT(cm.id) as total_messages,
-                    MIN(cs.started_at) as first_session,
-                    MAX(cs.last_activity) as last_activity
-                FROM chat_sessions cs
-                LEFT JOIN chat_messages cm ON cs.id = cm.session_id
-                WHERE cs.user_identifiant = %s
-            """, (user_identifiant,))
-
-            stats = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            with self.connection() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+                cursor.execute("""
+                    SELECT
+                        COUNT(*) as total_sessions,
+                        COALESCE(SUM(message_count), 0) as total_messages,
+                        MIN(started_at) as first_session,
+                        MAX(last_activity) as last_activity
+                    FROM chat_sessions
+                    WHERE user_identifiant = %s
+                """, (user_identifiant,))
+
+                stats = cursor.fetchone()
+                cursor.close()
 
             return stats
         except Exception as e:
             print(f"Erreur lors de la récupération des statistiques: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def has_response_cache(self):
+        """
+        Vérifie que la table response_cache existe, sans DDL: le schéma et les partitions
+        sont créés par init_database (service db_maintenance), jamais par l'application
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT to_regclass('response_cache') IS NOT NULL")
+                exists = cursor.fetchone()[0]
+                cursor.close()
+            return exists
+        except Exception as e:
+            print(f"Erreur lors de la vérification du cache de réponses: {e}")
+            return False
+
+    def get_cached_response(self, cache_key, max_age):
+        """Récupère une réponse en cache de moins de max_age secondes (et compte le succès)"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    UPDATE response_cache
+                    SET hits = hits + 1
+                    WHERE cache_key = %s
+                    AND created_at > NOW() - %s * INTERVAL '1 second'
+                    RETURNING response
+                """, (cache_key, max_age))
+
+                result = cursor.fetchone()
+                conn.commit()
+                cursor.close()
+
+            return result[0] if result else None
+        except Exception as e:
+            print(f"Erreur lors de la lecture du cache de réponses: {e}")
+            return None
+
+    def save_cached_response(self, cache_key, response):
+        """Enregistre (ou remplace) une réponse dans le cache"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    INSERT INTO response_cache (cache_key, response)
+                    VALUES (%s, %s)
+                    ON CONFLICT (cache_key) DO UPDATE
+                    SET response = EXCLUDED.response, created_at = CURRENT_TIMESTAMP, hits = 0
+                """, (cache_key, response))
+
+                conn.commit()
+                cursor.close()
+            return True
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement dans le cache de réponses: {e}")
+            return False
+
+    def purge_response_cache(self, max_age):
+        """Supprime les réponses en cache de plus de max_age secondes"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    DELETE FROM response_cache
+                    WHERE created_at <= NOW() - %s * INTERVAL '1 second'
+                """, (max_age,))
+
+                deleted = cursor.rowcount
+                conn.commit()
+                cursor.close()
+            return deleted
+        except Exception as e:
+            print(f"Erreur lors de la purge du cache de réponses: {e}")
+            return 0
+
+
+if __name__ == "__main__":
+    # Maintenance périodique (service db_maintenance): création des partitions à venir et archivage des anciennes
+    db = ChatHistoryDB(use_pool=False, write_behind=False)
+    if db.init_database() and db.partitioned:
+        for archive_path in db.maintain_partitions():
+            print(f"✅ Partition archivée: {archive_path}")
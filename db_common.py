@@ -0,0 +1,83 @@
+"""
+Fonctions communes aux accès PostgreSQL synchrone (database.py, psycopg2) et asynchrone
+(async_database.py, psycopg 3), sans dépendance à l'un ou l'autre pilote
+Fichier: db_common.py
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pages d'historique (keyset), servies par idx_messages_session_created et idx_messages_user_created,
+# sans tri (voir tests/test_database_plans.py). Un seul modèle par requête; {keyset} reçoit le filtre du curseur.
+_SESSION_HISTORY_TEMPLATE = """
+    SELECT id, role, content, created_at, metadata
+    FROM chat_messages
+    WHERE session_id = %s
+    {keyset}
+    ORDER BY created_at ASC, id ASC
+    LIMIT %s
+"""
+_SESSION_KEYSET = "(created_at, id) > (%s, %s)"
+
+_USER_HISTORY_TEMPLATE = """
+    SELECT cm.id, cm.role, cm.content, cm.created_at, cm.metadata,
+           cs.started_at as session_start
+    FROM chat_messages cm
+    JOIN chat_sessions cs ON cm.session_id = cs.id
+    WHERE cm.user_identifiant = %s
+    {keyset}
+    ORDER BY cm.created_at DESC, cm.id DESC
+    LIMIT %s
+"""
+_USER_KEYSET = "(cm.created_at, cm.id) < (%s, %s)"
+
+# psycopg2 (paramètres interpolés côté client): une seule requête pour toutes les pages,
+# paramètres (filtre, created_at, created_at, id du curseur, limite), curseur à None pour la première page
+SESSION_HISTORY_SQL = _SESSION_HISTORY_TEMPLATE.format(keyset=f"AND (%s IS NULL OR {_SESSION_KEYSET})")
+USER_HISTORY_SQL = _USER_HISTORY_TEMPLATE.format(keyset=f"AND (%s IS NULL OR {_USER_KEYSET})")
+
+# psycopg 3 (paramètres liés côté serveur): `%s IS NULL` n'a pas de type, la première page
+# n'a donc pas de filtre. Paramètres (filtre, limite) ou (filtre, created_at, id du curseur, limite)
+SESSION_HISTORY_FIRST_SQL = _SESSION_HISTORY_TEMPLATE.format(keyset="")
+SESSION_HISTORY_NEXT_SQL = _SESSION_HISTORY_TEMPLATE.format(keyset=f"AND {_SESSION_KEYSET}")
+USER_HISTORY_FIRST_SQL = _USER_HISTORY_TEMPLATE.format(keyset="")
+USER_HISTORY_NEXT_SQL = _USER_HISTORY_TEMPLATE.format(keyset=f"AND {_USER_KEYSET}")
+
+
+def get_connection_params():
+    """Paramètres de connexion PostgreSQL lus dans l'environnement (DB_HOST, DB_PORT, DB_NAME...)"""
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': os.getenv('DB_PORT', '5432'),
+        'database': os.getenv('DB_NAME', 'sunupechenet'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', 'your_password')
+    }
+
+
+def format_history(user_identifiant, messages):
+    """Formate pour le contexte de l'IA des messages lus du plus récent au plus ancien"""
+    if not messages:
+        return ""
+
+    context = "\n=== HISTORIQUE DES CONVERSATIONS PRÉCÉDENTES ===\n\n"
+    context += f"Utilisateur: {user_identifiant}\n"
+    context += f"Nombre de messages récents: {len(messages)}\n\n"
+
+    for msg in reversed(messages):  # Inverser pour avoir l'ordre chronologique
+        timestamp = msg['created_at'].strftime("%d/%m/%Y %H:%M")
+        role_label = "Utilisateur" if msg['role'] == 'user' else "Assistant"
+        context += f"[{timestamp}] {role_label}: {msg['content']}\n\n"
+
+    context += "=== FIN DE L'HISTORIQUE ===\n\n"
+    return context
+
+
+def history_cursor(messages):
+    """Curseur de la page suivante: (created_at, id) du dernier message d'une page, None si elle est vide"""
+    if not messages:
+        return None
+    return messages[-1]['created_at'], messages[-1]['id']
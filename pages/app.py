@@ -1,14 +1,26 @@
 import streamlit as st
-import pandas as pd
 import os
 from pathlib import Path
-from openai import OpenAI
+from openai import DefaultHttpxClient, OpenAI
 from dotenv import load_dotenv
 import glob
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 import requests
-from llama_index.core import SimpleDirectoryReader
+import httpx
+from tides import TIDE_STATIONS, TideEngine, format_tides
+from ttl_cache import TTLCache
+from data_store import EMPTY_DATA, DataWatcher
+from gazetteer import build_gazetteer
+from conversation_memory import ConversationMemory, format_summary_for_context
+from prompt_budget import PromptBuilder
+from question_analysis import analyze_question_type
+from response_cache import ResponseCache, response_cache_key
+from data_loader import PARSER_VERSION
+from retrieval import INDEX_VERSION, BM25Index, chunk_data, format_chunks_for_context
+from stats_engine import StatisticsEngine
 
 # Configuration de la page
 st.set_page_config(
@@ -20,54 +32,140 @@ st.set_page_config(
 # Charger les variables d'environnement
 load_dotenv()
 
-# ========== FONCTIONS DE LECTURE DE FICHIERS ==========
-
-def load_pdf_with_llamaindex(pdf_path):
+# Affichage des réponses token par token (STREAM_RESPONSES=0 pour désactiver)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1") != "0"
+
+# URL de l'API OpenWeatherMap (modifiable pour pointer vers un serveur de test local)
+OWM_BASE_URL = os.getenv("OWM_BASE_URL", "http://api.openweathermap.org/data/2.5").rstrip("/")
+
+# Échéance globale (secondes) pour rassembler météo, prévisions et données locales
+CONTEXT_FETCH_DEADLINE = float(os.getenv("CONTEXT_FETCH_DEADLINE", "8"))
+
+# Nombre maximum de villes récupérées pour une question de comparaison
+MAX_COMPARISON_CITIES = int(os.getenv("MAX_COMPARISON_CITIES", "6"))
+
+# Dossier des fichiers précalculés (index de recherche...)
+CACHE_DIR = os.getenv("SUNU_CACHE_DIR", os.path.join(os.path.dirname(__file__), '..', '.cache'))
+
+# Chargement des données: nombre de processus et délai maximal par fichier (secondes)
+DATA_LOAD_WORKERS = int(os.getenv("DATA_LOAD_WORKERS", str(min(4, os.cpu_count() or 1))))
+DATA_LOAD_TIMEOUT = float(os.getenv("DATA_LOAD_TIMEOUT", "300"))
+
+# Intervalle (secondes) de scrutation du dossier data pour le rechargement à chaud (0 = désactivé)
+DATA_WATCH_INTERVAL = float(os.getenv("DATA_WATCH_INTERVAL", "5"))
+
+# Nombre d'extraits et budget de tokens pour la recherche dans les données
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "800"))
+# Budget de tokens du prompt envoyé au modèle (total et par section)
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "12000"))
+PROMPT_REALTIME_BUDGET = int(os.getenv("PROMPT_REALTIME_BUDGET", "3000"))
+PROMPT_DATA_BUDGET = int(os.getenv("PROMPT_DATA_BUDGET", "5000"))
+PROMPT_HISTORY_BUDGET = int(os.getenv("PROMPT_HISTORY_BUDGET", "3000"))
+# Historique: derniers échanges envoyés tels quels, les plus anciens sont résumés par lots
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "6"))
+HISTORY_FOLD_TURNS = int(os.getenv("HISTORY_FOLD_TURNS", "3"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+# Résumés calculés en arrière-plan: délai d'un appel (sans nouvelle tentative) et nombre de threads dédiés
+HISTORY_SUMMARY_TIMEOUT = float(os.getenv("HISTORY_SUMMARY_TIMEOUT", "20"))
+HISTORY_SUMMARY_WORKERS = int(os.getenv("HISTORY_SUMMARY_WORKERS", "2"))
+
+# Nombre de jours de marées calculés (le calendrier du prompt couvre 7 jours)
+TIDE_DAYS = int(os.getenv("TIDE_DAYS", "7"))
+
+# Modèle OpenAI et client HTTP partagé (connexions persistantes, nouvelles tentatives sur 429/5xx)
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+
+# Cache des réponses: durée de vie (secondes, 0 = désactivé), taille en mémoire,
+# et partage entre instances via PostgreSQL (RESPONSE_CACHE_DB=1)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "0") == "1"
+
+# ========== CLIENT OPENAI ==========
+
+@st.cache_resource
+def get_openai_client():
     """
-    Charge et extrait le texte d'un PDF avec llama-index
+    Client OpenAI partagé par toutes les sessions du processus: le pool de connexions HTTP
+    (keep-alive, session TLS) est réutilisé d'une question à l'autre.
+    Les erreurs 408/409/429/5xx et de connexion sont retentées par le SDK
+    (backoff exponentiel avec jitter, en respectant l'en-tête Retry-After).
+    OPENAI_BASE_URL permet de viser un serveur compatible OpenAI.
     """
-    try:
-        reader = SimpleDirectoryReader(input_files=[pdf_path])
-        documents = reader.load_data()
-        text = "\n".join([doc.text for doc in documents])
-        return text
-    except Exception as e:
-        st.error(f"Erreur lors de la lecture du PDF {pdf_path}: {e}")
-        return None
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+            )
+        )
+    )
+
+# ========== CACHE DES RÉPONSES ==========
 
-def load_csv_with_encoding(file_path):
+@st.cache_resource
+def get_response_cache():
     """
-    Charge un CSV en essayant différents encodages
+    Cache des réponses partagé par toutes les sessions (None si RESPONSE_CACHE_TTL vaut 0).
+    Avec RESPONSE_CACHE_DB=1, les réponses sont aussi stockées dans PostgreSQL (ChatHistoryDB),
+    si la table response_cache a été créée par la maintenance (python database.py).
     """
-    encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
+    if RESPONSE_CACHE_TTL <= 0:
+        return None
 
-    for encoding in encodings:
+    store = None
+    if RESPONSE_CACHE_DB:
         try:
-            df = pd.read_csv(file_path, encoding=encoding)
-            return df
-        except UnicodeDecodeError:
-            continue
+            # database.py est à la racine du projet (PYTHONPATH=/app dans l'image Docker)
+            from database import ChatHistoryDB
+            store = ChatHistoryDB()
+            # Schéma et partitions: service db_maintenance (python database.py), pas l'application
+            if not store.has_response_cache():
+                print("Cache de réponses PostgreSQL indisponible: table response_cache absente "
+                      "(lancer `python database.py`)")
+                store = None
         except Exception as e:
-            st.error(f"Erreur lors du chargement de {file_path}: {e}")
-            return None
+            print(f"Cache de réponses PostgreSQL indisponible: {e}")
+            store = None
 
-    st.error(f"Impossible de lire {file_path} avec les encodages testés")
-    return None
+    return ResponseCache(RESPONSE_CACHE_TTL, maxsize=RESPONSE_CACHE_SIZE, store=store)
 
 # ========== FONCTIONS OPENWEATHERMAP ==========
 
-def get_weather_data(city="Dakar", lat=None, lon=None):
+@st.cache_resource
+def get_weather_cache():
     """
-    Récupère les données météo actuelles depuis OpenWeatherMap
+    Cache OpenWeatherMap partagé par toutes les sessions du processus
+    (WEATHER_CACHE_TTL secondes de fraîcheur, puis WEATHER_CACHE_STALE_TTL de rechargement en arrière-plan)
     """
-    api_key = os.getenv("OWM_API_KEY")
-    if not api_key:
-        return None
+    return TTLCache(
+        ttl=float(os.getenv("WEATHER_CACHE_TTL", "600")),
+        stale_ttl=float(os.getenv("WEATHER_CACHE_STALE_TTL", "1800")),
+        maxsize=256
+    )
 
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
+def weather_cache_key(endpoint, city="Dakar", lat=None, lon=None):
+    """
+    Clé de cache météo: (endpoint, ville normalisée) ou (endpoint, lat/lon arrondies à ~1 km)
+    """
+    if lat and lon:
+        return (endpoint, round(float(lat), 2), round(float(lon), 2))
+    return (endpoint, city.strip().lower())
 
+def fetch_owm_data(endpoint, city="Dakar", lat=None, lon=None):
+    """
+    Appelle l'API OpenWeatherMap (endpoint 'weather' ou 'forecast'), lève une exception en cas d'erreur
+    """
     params = {
-        "appid": api_key,
+        "appid": os.getenv("OWM_API_KEY"),
         "units": "metric",
         "lang": "fr"
     }
@@ -78,138 +176,123 @@ def get_weather_data(city="Dakar", lat=None, lon=None):
     else:
         params["q"] = city
 
-    try:
-        response = requests.get(base_url, params=params, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        st.error(f"Erreur API météo: {e}")
-        return None
+    response = requests.get(f"{OWM_BASE_URL}/{endpoint}", params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
 
-def get_forecast_data(city="Dakar", lat=None, lon=None, days=5):
+def load_owm_data(cache, endpoint, city="Dakar", lat=None, lon=None):
     """
-    Récupère les prévisions météo sur plusieurs jours
+    Données OpenWeatherMap via le cache partagé (utilisable hors du thread Streamlit)
     """
-    api_key = os.getenv("OWM_API_KEY")
-    if not api_key:
-        return None
+    return cache.get_or_load(
+        weather_cache_key(endpoint, city, lat, lon),
+        lambda: fetch_owm_data(endpoint, city, lat, lon)
+    )
 
-    base_url = "http://api.openweathermap.org/data/2.5/forecast"
+# ========== RÉCUPÉRATION PARALLÈLE DU CONTEXTE ==========
 
-    params = {
-        "appid": api_key,
-        "units": "metric",
-        "lang": "fr"
-    }
+@st.cache_resource
+def get_io_executor():
+    """
+    Pool de threads partagé pour les appels réseau et la préparation du contexte
+    """
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("CONTEXT_FETCH_WORKERS", "8")),
+        thread_name_prefix="context-fetch"
+    )
 
-    if lat and lon:
-        params["lat"] = lat
-        params["lon"] = lon
+def gather_with_deadline(tasks, deadline):
+    """
+    Exécute en parallèle des tâches indépendantes {nom: fonction} et attend au plus `deadline` secondes.
+    Returns: (résultats {nom: valeur}, échecs {nom: raison}) — une tâche lente ou en erreur
+    est reportée dans les échecs au lieu de bloquer la réponse
+    """
+    futures = {get_io_executor().submit(fn): name for name, fn in tasks.items()}
+    done, _ = wait(futures, timeout=deadline)
+
+    results, failures = {}, {}
+    for future, name in futures.items():
+        if future not in done:
+            future.cancel()
+            failures[name] = f"délai de {deadline:g}s dépassé"
+        elif future.exception() is not None:
+            failures[name] = str(future.exception())
+        else:
+            results[name] = future.result()
+    return results, failures
+
+@st.cache_resource
+def get_tide_engine():
+    """
+    Moteur de marées partagé par toutes les sessions; les jours du calendrier sont calculés d'avance
+    """
+    engine = TideEngine(TIDE_STATIONS)
+    engine.precompute(datetime.now().date(), TIDE_DAYS)
+    return engine
+
+def get_tide_data(city="Dakar", lat=None, lon=None, days=TIDE_DAYS):
+    """
+    Horaires de marée calculés pour la station de la ville (ou la plus proche des coordonnées),
+    du jour même à `days` jours
+    """
+    engine = get_tide_engine()
+    if city in engine.stations:
+        station = city
+    elif lat is not None and lon is not None:
+        station = engine.nearest_station(lat, lon)
     else:
-        params["q"] = city
+        station = "Dakar"
 
-    try:
-        response = requests.get(base_url, params=params, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        st.error(f"Erreur API prévisions: {e}")
-        return None
+    now = datetime.now()
+    jours_semaine = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+    tide_days = [
+        {'day': jours_semaine[day.weekday()], 'date': day.strftime('%d/%m/%Y'), 'tides': format_tides(extremes)}
+        for day, extremes in engine.extrema(station, now.date(), days).items()
+    ]
 
-def get_tide_data():
-    """
-    Récupère les données de marée pour les principales villes de pêche du Sénégal
-    """
-    current_time = datetime.now().strftime("%H:%M")
-
-    tide_data = {
-        "Dakar": {
-            "current_time": current_time,
-            "today": [
-                {"type": "haute", "time": "05:30", "height": "1.2m"},
-                {"type": "basse", "time": "11:45", "height": "0.3m"},
-                {"type": "haute", "time": "17:50", "height": "1.3m"},
-                {"type": "basse", "time": "23:55", "height": "0.2m"}
-            ],
-            "tomorrow": [
-                {"type": "haute", "time": "06:15", "height": "1.3m"},
-                {"type": "basse", "time": "12:30", "height": "0.2m"},
-                {"type": "haute", "time": "18:35", "height": "1.4m"}
-            ]
-        },
-        "Saint-Louis": {
-            "current_time": current_time,
-            "today": [
-                {"type": "haute", "time": "05:15", "height": "1.4m"},
-                {"type": "basse", "time": "11:30", "height": "0.2m"},
-                {"type": "haute", "time": "17:35", "height": "1.5m"},
-                {"type": "basse", "time": "23:40", "height": "0.1m"}
-            ],
-            "tomorrow": [
-                {"type": "haute", "time": "06:00", "height": "1.5m"},
-                {"type": "basse", "time": "12:15", "height": "0.1m"},
-                {"type": "haute", "time": "18:20", "height": "1.6m"}
-            ]
-        },
-        "Mbour": {
-            "current_time": current_time,
-            "today": [
-                {"type": "haute", "time": "05:45", "height": "1.1m"},
-                {"type": "basse", "time": "12:00", "height": "0.4m"},
-                {"type": "haute", "time": "18:05", "height": "1.2m"}
-            ],
-            "tomorrow": [
-                {"type": "haute", "time": "06:30", "height": "1.2m"},
-                {"type": "basse", "time": "12:45", "height": "0.3m"},
-                {"type": "haute", "time": "18:50", "height": "1.3m"}
-            ]
-        },
-        "Kayar": {
-            "current_time": current_time,
-            "today": [
-                {"type": "haute", "time": "05:20", "height": "1.3m"},
-                {"type": "basse", "time": "11:35", "height": "0.3m"},
-                {"type": "haute", "time": "17:40", "height": "1.4m"},
-                {"type": "basse", "time": "23:45", "height": "0.2m"}
-            ],
-            "tomorrow": [
-                {"type": "haute", "time": "06:05", "height": "1.4m"},
-                {"type": "basse", "time": "12:20", "height": "0.2m"},
-                {"type": "haute", "time": "18:25", "height": "1.5m"}
-            ]
-        },
-        "Joal-Fadiouth": {
-            "current_time": current_time,
-            "today": [
-                {"type": "haute", "time": "05:50", "height": "1.1m"},
-                {"type": "basse", "time": "12:05", "height": "0.4m"},
-                {"type": "haute", "time": "18:10", "height": "1.2m"}
-            ],
-            "tomorrow": [
-                {"type": "haute", "time": "06:35", "height": "1.2m"},
-                {"type": "basse", "time": "12:50", "height": "0.3m"},
-                {"type": "haute", "time": "18:55", "height": "1.3m"}
-            ]
-        },
-        "Kaolack": {
-            "current_time": current_time,
-            "today": [
-                {"type": "haute", "time": "05:50", "height": "1.1m"},
-                {"type": "basse", "time": "12:05", "height": "0.4m"},
-                {"type": "haute", "time": "18:10", "height": "1.2m"}
-            ],
-            "tomorrow": [
-                {"type": "haute", "time": "06:35", "height": "1.2m"},
-                {"type": "basse", "time": "12:50", "height": "0.3m"},
-                {"type": "haute", "time": "18:55", "height": "1.3m"}
-            ]
-        }
+    return {
+        'station': station,
+        'current_time': now.strftime("%H:%M"),
+        'days': tide_days,
+        'today': tide_days[0]['tides'],
+        'tomorrow': tide_days[1]['tides'] if len(tide_days) > 1 else []
     }
-    return tide_data
 
-def format_weather_for_context(weather_data, forecast_data=None):
+def format_tides_for_context(city_tide):
+    """
+    Formate les horaires de marée (tous les jours calculés) et les règles de pêche associées
+    """
+    context = f"\n\n=== HORAIRES DES MAREES A {city_tide['station'].upper()} ===\n"
+    context += f"HEURE ACTUELLE: {city_tide.get('current_time', 'N/A')}\n"
+
+    for i, tide_day in enumerate(city_tide['days']):
+        label = "AUJOURD'HUI" if i == 0 else "DEMAIN" if i == 1 else tide_day['day'].upper()
+        context += f"\n{label} ({tide_day['day']} {tide_day['date']}):\n"
+        for tide in tide_day['tides']:
+            context += f"Maree {tide['type']}: {tide['time']} ({tide['height']})\n"
+
+    context += f"\n*** IMPORTANT: Compare l'heure actuelle ({city_tide.get('current_time', 'N/A')}) avec les horaires de marée ***\n"
+    context += f"*** Ne recommande QUE les créneaux FUTURS (après {city_tide.get('current_time', 'N/A')}) ***\n\n"
+
+    context += "\nREGLES D'OR DE LA PECHE AUX MAREES:\n"
+    context += "MEILLEURS MOMENTS (poissons tres actifs):\n"
+    context += "   - 2h AVANT maree haute (maree montante)\n"
+    context += "   - 2h APRES debut maree haute (debut de descente)\n"
+    context += "   - Pendant la MAREE MONTANTE (flux)\n"
+    context += "\nMOMENTS MOYENS:\n"
+    context += "   - Debut de maree descendante\n"
+    context += "   - 1h apres maree basse\n"
+    context += "\nA EVITER (poissons inactifs):\n"
+    context += "   - Maree haute STATIONNAIRE (etale haute mer)\n"
+    context += "   - Maree basse STATIONNAIRE (etale basse mer)\n"
+    context += "   - Ces moments l'eau ne bouge pas = poissons dorment\n"
+
+    return context
+
+def format_weather_for_context(weather_data, forecast_data=None, place=None):
     """
     Formate les données météo pour le contexte du chatbot
+    place: nom du lieu demandé (la station renvoyée pour des coordonnées peut porter un autre nom)
     """
     if not weather_data:
         return ""
@@ -217,7 +300,7 @@ def format_weather_for_context(weather_data, forecast_data=None):
     context = "\n=== DONNEES METEO EN TEMPS REEL (OpenWeatherMap) ===\n\n"
 
     # Météo actuelle
-    context += f"Lieu: {weather_data.get('name', 'N/A')}\n"
+    context += f"Lieu: {place or weather_data.get('name', 'N/A')}\n"
     context += f"Temperature: {weather_data['main']['temp']}°C (Ressenti: {weather_data['main']['feels_like']}°C)\n"
     context += f"Conditions: {weather_data['weather'][0]['description']}\n"
     context += f"Vent: {weather_data['wind']['speed']} m/s, Direction: {weather_data['wind'].get('deg', 'N/A')}°\n"
@@ -268,155 +351,56 @@ def format_weather_for_context(weather_data, forecast_data=None):
                 context += f"   {prev['heure']}: {prev['temp']}°C, {prev['conditions']}, "
                 context += f"vent {prev['vent']} m/s, humidité {prev['humidite']}%\n"
 
-    # Ajouter les données de marée
-    tide_data = get_tide_data()
-    city_name = weather_data.get('name', 'Dakar')
-
-    # Vérifier si la ville existe dans tide_data, sinon utiliser Dakar par défaut
-    if city_name not in tide_data:
-        city_name = 'Dakar'
-
-    city_tide = tide_data[city_name]
-    context += f"\n\n=== HORAIRES DES MAREES A {city_name.upper()} ===\n"
-    context += f"HEURE ACTUELLE: {city_tide.get('current_time', 'N/A')}\n\n"
-    context += f"AUJOURD'HUI ({city_tide.get('today_day', 'N/A')} {city_tide.get('today_date', 'N/A')}):\n"
-    for tide in city_tide.get('today', []):
-        context += f"Maree {tide['type']}: {tide['time']} ({tide['height']})\n"
-
-    context += f"\nDEMAIN ({city_tide.get('tomorrow_day', 'N/A')} {city_tide.get('tomorrow_date', 'N/A')}):\n"
-    for tide in city_tide.get('tomorrow', []):
-        context += f"Maree {tide['type']}: {tide['time']} ({tide['height']})\n"
-
-    context += f"\n*** IMPORTANT: Compare l'heure actuelle ({city_tide.get('current_time', 'N/A')}) avec les horaires de marée ***\n"
-    context += f"*** Ne recommande QUE les créneaux FUTURS (après {city_tide.get('current_time', 'N/A')}) ***\n\n"
-
-    context += "\nREGLES D'OR DE LA PECHE AUX MAREES:\n"
-    context += "MEILLEURS MOMENTS (poissons tres actifs):\n"
-    context += "   - 2h AVANT maree haute (maree montante)\n"
-    context += "   - 2h APRES debut maree haute (debut de descente)\n"
-    context += "   - Pendant la MAREE MONTANTE (flux)\n"
-    context += "\nMOMENTS MOYENS:\n"
-    context += "   - Debut de maree descendante\n"
-    context += "   - 1h apres maree basse\n"
-    context += "\nA EVITER (poissons inactifs):\n"
-    context += "   - Maree haute STATIONNAIRE (etale haute mer)\n"
-    context += "   - Maree basse STATIONNAIRE (etale basse mer)\n"
-    context += "   - Ces moments l'eau ne bouge pas = poissons dorment\n"
+    # Ajouter les données de marée (station du lieu, ou la plus proche des coordonnées renvoyées)
+    coord = weather_data.get('coord', {})
+    context += format_tides_for_context(
+        get_tide_data(place or weather_data.get('name', 'Dakar'), coord.get('lat'), coord.get('lon'))
+    )
 
     context += "\n" + "="*60 + "\n"
     return context
 
-# ========== NOUVELLE FONCTION: DÉTECTION INTELLIGENTE DES QUESTIONS ==========
-
-def analyze_question_type(question):
+def format_weather_comparison(city_weather):
     """
-    Analyse intelligemment le type de question pour déterminer quelles données utiliser
-    Returns: dict avec les flags nécessaires
+    Formate un tableau compact météo/marées côte à côte pour plusieurs villes
+    city_weather: dict {ville: (weather_data, forecast_data)}
     """
-    question_lower = question.lower()
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    context = "\n=== COMPARAISON METEO ENTRE VILLES (OpenWeatherMap) ===\n\n"
+    context += "Ville | Actuel: temp, conditions, vent, humidite | Demain: temp min-max, vent max | Marees hautes aujourd'hui\n"
 
-    analysis = {
-        'needs_weather': False,
-        'needs_tide': False,
-        'needs_statistics': False,
-        'needs_species': False,
-        'needs_regulations': False,
-        'needs_platform_info': False,
-        'needs_comparison': False,
-        'city': None
-    }
+    for city, (weather_data, forecast_data) in city_weather.items():
+        if not weather_data:
+            context += f"{city} | donnees indisponibles | - | -\n"
+            continue
 
-    # Mots-clés météo
-    weather_keywords = ['météo', 'meteo', 'temps', 'température', 'temperature', 'vent',
-                       'pluie', 'soleil', 'nuage', 'prévision', 'prevision', 'conditions']
-
-    # Mots-clés marée
-    tide_keywords = ['marée', 'maree', 'marées', 'marees', 'haute', 'basse', 'flux',
-                    'horaire', 'moment', 'quand']
-
-    # Mots-clés pêche (besoin de combiner météo + marée)
-    fishing_keywords = ['pêcher', 'pecher', 'pêche', 'peche', 'partir', 'sortie',
-                       'aller', 'conseille', 'conseil', 'recommande']
-
-    # Mots-clés statistiques
-    stats_keywords = ['statistique', 'statistiques', 'données', 'donnees', 'capture',
-                     'débarquement', 'debarquement', 'tendance', 'volume', 'tonnage']
-
-    # Mots-clés espèces
-    species_keywords = ['thiof', 'sardinelle', 'capitaine', 'poisson', 'espèce', 'espece',
-                       'prix', 'valeur', 'quota']
-
-    # Mots-clés réglementation
-    regulation_keywords = ['règle', 'regle', 'réglementation', 'reglementation', 'loi',
-                          'interdit', 'autorisé', 'autorise', 'permis', 'licence']
-
-    # Mots-clés plateforme
-    platform_keywords = ['sunupechenet', 'pechenet', 'sunu', 'plateforme', 'application', 'app',
-                        'fonctionnalité', 'fonctionnalite', 'comment', 'utiliser']
-
-    # Mots-clés comparaison
-    comparison_keywords = ['comparer', 'comparaison', 'différence', 'difference',
-                          'meilleur', 'vs', 'entre']
-
-    # Détection des besoins
-    if any(kw in question_lower for kw in weather_keywords):
-        analysis['needs_weather'] = True
-
-    if any(kw in question_lower for kw in tide_keywords):
-        analysis['needs_tide'] = True
-
-    if any(kw in question_lower for kw in fishing_keywords):
-        analysis['needs_weather'] = True
-        analysis['needs_tide'] = True
-
-    if any(kw in question_lower for kw in stats_keywords):
-        analysis['needs_statistics'] = True
-
-    if any(kw in question_lower for kw in species_keywords):
-        analysis['needs_species'] = True
-        analysis['needs_statistics'] = True  # Souvent liées
-
-    if any(kw in question_lower for kw in regulation_keywords):
-        analysis['needs_regulations'] = True
-
-    if any(kw in question_lower for kw in platform_keywords):
-        analysis['needs_platform_info'] = True
-
-    if any(kw in question_lower for kw in comparison_keywords):
-        analysis['needs_comparison'] = True
-        analysis['needs_statistics'] = True
-        analysis['needs_weather'] = True
-
-    # Détection de la ville
-    cities = {
-        'dakar': 'Dakar',
-        'saint-louis': 'Saint-Louis',
-        'saint louis': 'Saint-Louis',
-        'thiès': 'Thiès',
-        'thies': 'Thiès',
-        'mbour': 'Mbour',
-        'joal': 'Joal-Fadiouth',
-        'ziguinchor': 'Ziguinchor',
-        'kayar': 'Kayar',
-        'kaolack': 'kaolack'
-    }
+        current = (f"{weather_data['main']['temp']}°C, {weather_data['weather'][0]['description']}, "
+                   f"{weather_data['wind']['speed']} m/s, {weather_data['main']['humidity']}%")
 
-    for city_key, city_name in cities.items():
-        if city_key in question_lower:
-            analysis['city'] = city_name
-            break
+        demain = "-"
+        if forecast_data and 'list' in forecast_data:
+            tomorrow_forecasts = [f for f in forecast_data['list']
+                                  if datetime.fromtimestamp(f['dt']).strftime('%Y-%m-%d') == tomorrow]
+            if tomorrow_forecasts:
+                temps = [f['main']['temp'] for f in tomorrow_forecasts]
+                vent_max = max(f['wind']['speed'] for f in tomorrow_forecasts)
+                demain = f"{min(temps)}-{max(temps)}°C, {vent_max} m/s"
+
+        coord = weather_data.get('coord', {})
+        city_tide = get_tide_data(city, coord.get('lat'), coord.get('lon'), days=1)
+        hautes = ", ".join(t['time'] for t in city_tide['today'] if t['type'] == 'haute') or "-"
 
-    if not analysis['city']:
-        analysis['city'] = "Dakar"  # Par défaut
+        context += f"{city} | {current} | {demain} | {hautes}\n"
 
-    return analysis
+    context += "\nCLASSE les villes avec ce tableau (vent faible et maree montante = meilleures conditions).\n"
+    context += "\n" + "="*60 + "\n"
+    return context
 
 # ========== CHARGEMENT DES DONNÉES ==========
 
-@st.cache_data
-def load_all_data():
+def find_data_folder():
     """
-    Charge tous les fichiers CSV, PDF et JSON du dossier data
+    Localise le dossier data (None s'il est introuvable)
     """
     # CORRECTION: __file__ au lieu de _file_
     possible_paths = [
@@ -426,61 +410,107 @@ def load_all_data():
         '../data'
     ]
 
-    data_folder = None
     for path in possible_paths:
         if os.path.exists(path):
-            data_folder = path
-            break
+            return path
+    return None
 
+def prepare_data_entry(filename, data_info):
+    """
+    Précalcule l'extrait de contexte d'un fichier chargé (évite de le resérialiser à chaque question)
+    """
+    data_info['context'] = build_context_snippet(filename, data_info)
+
+@st.cache_resource(show_spinner=False)
+def get_data_watcher():
+    """
+    Charge le dossier data une fois par processus puis le surveille (toutes les DATA_WATCH_INTERVAL secondes):
+    seuls les fichiers ajoutés ou modifiés sont rechargés (instantané disque, PDF et gros fichiers en parallèle)
+    """
+    data_folder = find_data_folder()
     if not data_folder:
-        return {}
+        return None
 
-    all_data = {}
+    watcher = DataWatcher(
+        data_folder,
+        os.path.join(CACHE_DIR, 'snapshot'),
+        workers=DATA_LOAD_WORKERS,
+        timeout=DATA_LOAD_TIMEOUT,
+        prepare=prepare_data_entry,
+        poll_interval=DATA_WATCH_INTERVAL
+    )
 
-    # Charger les CSV
-    csv_files = glob.glob(os.path.join(data_folder, '*.csv'))
-    for file in csv_files:
-        filename = os.path.basename(file)
-        try:
-            df = load_csv_with_encoding(file)
-            if df is not None:
-                all_data[filename] = {'type': 'csv', 'content': df}
-        except Exception as e:
-            st.error(f"Erreur CSV {filename}: {e}")
+    progress_bar = st.progress(0.0, text="Chargement des données...")
 
-    # Charger les PDF
-    pdf_files = glob.glob(os.path.join(data_folder, '*.pdf'))
-    for file in pdf_files:
-        filename = os.path.basename(file)
-        try:
-            text = load_pdf_with_llamaindex(file)
-            if text:
-                all_data[filename] = {'type': 'pdf', 'content': text}
-        except Exception as e:
-            st.error(f"Erreur PDF {filename}: {e}")
+    def show_progress(done, total, file):
+        progress_bar.progress(done / total, text=f"Chargement des données ({done}/{total}): {os.path.basename(file)}")
 
-    # Charger les JSON
-    json_files = glob.glob(os.path.join(data_folder, '*.json'))
-    for file in json_files:
-        filename = os.path.basename(file)
-        try:
-            with open(file, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
-                all_data[filename] = {'type': 'json', 'content': json_data}
-        except Exception as e:
-            st.error(f"Erreur JSON {filename}: {e}")
+    watcher.refresh(progress=show_progress)
+    progress_bar.empty()
+    watcher.start()
+    return watcher
+
+def get_published_data():
+    """
+    Version actuellement publiée des données, partagée par toutes les sessions du processus.
+    À lire une seule fois par requête pour travailler sur un jeu de données cohérent.
+    """
+    watcher = get_data_watcher()
+    return watcher.current if watcher else EMPTY_DATA
+
+def build_context_snippet(filename, data_info):
+    """
+    Construit l'extrait de contexte d'un fichier (calculé une fois au chargement)
+    """
+    context = f"=== {filename} ===\n"
+
+    if data_info['type'] == 'csv':
+        df = data_info['content']
+        context += f"Type: CSV\n"
+        context += f"Colonnes: {', '.join(df.columns.tolist())}\n"
+        context += f"Lignes: {len(df)}\n"
+
+        if len(df) > 0:
+            context += "\nECHANTILLON (20 premières lignes):\n"
+            context += df.head(20).to_string(index=False)
+        context += "\n"
+
+    elif data_info['type'] == 'pdf':
+        text = data_info['content']
+        context += f"Type: PDF\n"
+        if len(text) > 2000:
+            context += "EXTRAIT:\n" + text[:2000] + "...\n"
+        else:
+            context += "CONTENU:\n" + text + "\n"
+
+    elif data_info['type'] == 'json':
+        json_content = data_info['content']
+        context += f"Type: JSON\n"
+        json_str = json.dumps(json_content, indent=2, ensure_ascii=False)
+        if len(json_str) > 1000:
+            context += "EXTRAIT:\n" + json_str[:1000] + "...\n"
+        else:
+            context += "CONTENU:\n" + json_str + "\n"
 
-    return all_data
+    context += "\n"
+    return context
 
-def create_context_from_data(data_dict, include_stats=False, include_species=False, include_regulations=False):
+def create_context_from_data(data_dict, include_stats=False, include_species=False, include_regulations=False,
+                             exclude=()):
     """
     Crée un contexte INTELLIGENT selon les besoins détectés
+    (simple concaténation des extraits précalculés au chargement des données)
+    exclude: fichiers déjà couverts par les statistiques calculées, dont l'extrait brut n'est pas repris
     """
-    context = "DONNEES DISPONIBLES:\n\n"
-    context += f"Date actuelle: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n\n"
+    parts = [
+        "DONNEES DISPONIBLES:\n\n",
+        f"Date actuelle: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n\n"
+    ]
 
     for filename, data_info in data_dict.items():
         # Filtrage intelligent
+        if filename in exclude:
+            continue
         if not include_stats and 'statistique' in filename.lower():
             continue
         if not include_species and 'espece' in filename.lower():
@@ -488,69 +518,247 @@ def create_context_from_data(data_dict, include_stats=False, include_species=Fal
         if not include_regulations and ('reglement' in filename.lower() or 'loi' in filename.lower()):
             continue
 
-        context += f"=== {filename} ===\n"
+        snippet = data_info.get('context')
+        if snippet is None:
+            snippet = build_context_snippet(filename, data_info)
+        parts.append(snippet)
 
-        if data_info['type'] == 'csv':
-            df = data_info['content']
-            context += f"Type: CSV\n"
-            context += f"Colonnes: {', '.join(df.columns.tolist())}\n"
-            context += f"Lignes: {len(df)}\n"
+    return "".join(parts)
 
-            if len(df) > 0:
-                context += "\nECHANTILLON (20 premières lignes):\n"
-                context += df.head(20).to_string(index=False)
-            context += "\n"
+# ========== RECHERCHE DANS LES DONNÉES ==========
 
-        elif data_info['type'] == 'pdf':
-            text = data_info['content']
-            context += f"Type: PDF\n"
-            if len(text) > 2000:
-                context += "EXTRAIT:\n" + text[:2000] + "...\n"
-            else:
-                context += "CONTENU:\n" + text + "\n"
-
-        elif data_info['type'] == 'json':
-            json_content = data_info['content']
-            context += f"Type: JSON\n"
-            json_str = json.dumps(json_content, indent=2, ensure_ascii=False)
-            if len(json_str) > 1000:
-                context += "EXTRAIT:\n" + json_str[:1000] + "...\n"
-            else:
-                context += "CONTENU:\n" + json_str + "\n"
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_retrieval_index(signature, _data):
+    """
+    Index BM25 sur tout le dossier data, persisté dans CACHE_DIR et reconstruit quand les fichiers,
+    les analyseurs (PARSER_VERSION) ou le découpage et l'indexation (INDEX_VERSION) changent
+    """
+    index_path = os.path.join(CACHE_DIR, f"bm25_{signature}-v{PARSER_VERSION}.{INDEX_VERSION}.pkl")
+    if os.path.exists(index_path):
+        try:
+            return BM25Index.load(index_path)
+        except Exception as e:
+            st.warning(f"Index de recherche illisible, reconstruction: {e}")
 
-        context += "\n"
+    index = BM25Index(chunk_data(_data))
+    try:
+        index.save(index_path)
+        # Supprimer les index des versions précédentes des données
+        for old_path in glob.glob(os.path.join(CACHE_DIR, "bm25_*.pkl")):
+            if os.path.abspath(old_path) != os.path.abspath(index_path):
+                os.remove(old_path)
+    except OSError as e:
+        st.warning(f"Impossible d'enregistrer l'index de recherche: {e}")
+    return index
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_gazetteer(signature, _data):
+    """
+    Index des lieux (sites de débarquement, villes, régions) reconstruit quand les fichiers changent
+    """
+    return build_gazetteer(_data)
 
-    return context
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_stats_engine(signature, _data):
+    """
+    Agrégats statistiques (débarquements région × mois, captures zone × espèce) reconstruits quand les fichiers changent
+    """
+    return StatisticsEngine(_data)
+
+def create_retrieval_context(user_question, signature, data):
+    """
+    Extraits les plus pertinents pour la question (top-k sous budget de tokens)
+    """
+    if not data:
+        return ""
+
+    index = get_retrieval_index(signature, data)
+    chunks = index.select(user_question, k=RETRIEVAL_TOP_K, token_budget=RETRIEVAL_TOKEN_BUDGET)
+    return format_chunks_for_context(chunks)
 
 # ========== CHATBOT AMÉLIORÉ ==========
 
-def get_chatbot_response(messages, base_context, user_question):
+@st.cache_resource
+def get_summary_executor():
     """
-    Génère une réponse INTELLIGENTE en combinant les bonnes sources
+    Threads dédiés aux résumés d'historique, séparés du pool du contexte: un résumé lent
+    ne bloque ni la météo ni les données des autres sessions
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return ThreadPoolExecutor(max_workers=HISTORY_SUMMARY_WORKERS, thread_name_prefix="history-summary")
 
-    # Analyse intelligente de la question
-    analysis = analyze_question_type(user_question)
+def summarize_history(client, previous_summary, messages):
+    """
+    Met à jour le résumé de la conversation avec les messages sortis de la fenêtre.
+    Appelée dans un thread de get_summary_executor: le client est obtenu par l'appelant,
+    sur le thread du script (get_openai_client est une ressource Streamlit).
+    Returns: le nouveau résumé, ou None en cas d'erreur (les messages restent envoyés tels quels)
+    """
+    transcript = "\n".join(
+        f"{'Utilisateur' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in messages
+    )
+    prompt = f"""Résumé actuel de la conversation:
+{previous_summary or "(aucun)"}
 
-    # Construction du contexte selon les besoins
-    final_context = ""
+Nouveaux échanges:
+{transcript}
 
-    # 1. Ajouter météo si nécessaire
-    if analysis['needs_weather'] or analysis['needs_tide']:
-        weather_data = get_weather_data(city=analysis['city'])
-        forecast_data = get_forecast_data(city=analysis['city'])
-        weather_context = format_weather_for_context(weather_data, forecast_data)
-        final_context += weather_context
-
-    # 2. Ajouter données locales filtrées
-    filtered_context = create_context_from_data(
-        st.session_state.all_data,
-        include_stats=analysis['needs_statistics'],
-        include_species=analysis['needs_species'],
-        include_regulations=analysis['needs_regulations']
+Mets à jour le résumé en quelques phrases: sujets abordés, lieux, dates, espèces, chiffres clés
+et décisions de l'utilisateur. Réponds uniquement par le résumé."""
+
+    try:
+        response = client.chat.completions.create(
+            model=DEFAULT_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            max_tokens=HISTORY_SUMMARY_MAX_TOKENS
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"Erreur lors du résumé de l'historique: {e}")
+        return None
+
+def analyze_user_question(user_question, published):
+    """
+    Analyse intelligente de la question (besoins et lieux cités, en une passe)
+    avec le gazetteer de la version publiée des données
+    """
+    gazetteer = get_gazetteer(published.signature, published.data)
+    return analyze_question_type(user_question, gazetteer.matcher)
+
+def needs_realtime_weather(analysis):
+    """La question a besoin de la météo OpenWeatherMap (clé OWM_API_KEY configurée)"""
+    return bool((analysis['needs_weather'] or analysis['needs_tide']) and os.getenv("OWM_API_KEY"))
+
+def comparison_cities_for(analysis):
+    """Comparaison: toutes les villes citées, ou tous les sites de débarquement connus si aucune n'est nommée"""
+    if analysis['needs_comparison'] and len(analysis['cities']) != 1:
+        return (analysis['cities'] or list(TIDE_STATIONS))[:MAX_COMPARISON_CITIES]
+    return []
+
+def question_cache_key(user_question, analysis, published, messages, weather=None):
+    """
+    Clé du cache de réponses, calculable avant de construire le contexte.
+    `weather`: données météo utilisées pour la réponse [weather, forecast par lieu]; par défaut, celles
+    que le cache OpenWeatherMap servira (la clé suit les données réellement chargées, pas l'horloge).
+    Returns: la clé, ou None si la réponse ne doit pas passer par le cache:
+    - marées: la réponse dépend de l'heure courante (prochaine pleine mer...),
+    - météo absente du cache OpenWeatherMap ou indisponible (la clé est recalculée après le chargement)
+    """
+    if analysis['needs_tide']:
+        return None
+
+    if needs_realtime_weather(analysis) and weather is None:
+        gazetteer = get_gazetteer(published.signature, published.data)
+        weather_cache = get_weather_cache()
+        weather = []
+        for city in comparison_cities_for(analysis) or [analysis['city']]:
+            lat, lon = gazetteer.coordinates(city)
+            for endpoint in ("weather", "forecast"):
+                weather.append(weather_cache.peek(weather_cache_key(endpoint, city, lat, lon)))
+    if weather is not None and any(payload is None for payload in weather):
+        return None
+
+    # Échanges précédant la question (la question courante est le dernier message)
+    history = [m for m in messages[:-1] if not m.get('static')]
+    return response_cache_key(
+        user_question, analysis, published.signature, datetime.now().strftime('%Y-%m-%d'), weather, history
     )
-    final_context += filtered_context
+
+def build_chat_messages(messages, base_context, user_question, report=None, memory=None, analysis=None):
+    """
+    Construit la liste de messages (prompt système + conversation) envoyée au modèle,
+    dans la limite de PROMPT_MAX_TOKENS tokens.
+    Avec `memory` (ConversationMemory de la session), seuls les derniers échanges sont envoyés
+    tels quels, les plus anciens sous forme de résumé.
+    `analysis`: résultat de analyze_user_question s'il est déjà calculé.
+    Si `report` est un dict, il reçoit le nombre de tokens par section, les sections réduites
+    et les données météo utilisées ('weather', pour question_cache_key).
+    """
+    published = get_published_data()
+    all_data = published.data
+    gazetteer = get_gazetteer(published.signature, all_data)
+
+    if analysis is None:
+        analysis = analyze_user_question(user_question, published)
+
+    # Construction du contexte selon les besoins: les sources indépendantes
+    # sont récupérées en parallèle, avec une échéance globale
+    weather_cache = get_weather_cache()
+    city = analysis['city']
+
+    # Chiffres calculés sur les tables précalculées: remplacent les extraits bruts des fichiers concernés
+    stats_context, stats_sources = get_stats_engine(published.signature, all_data).answer(
+        user_question, analysis, gazetteer)
+
+    tasks = {
+        'local': lambda: create_context_from_data(
+            all_data,
+            include_stats=analysis['needs_statistics'],
+            include_species=analysis['needs_species'],
+            include_regulations=analysis['needs_regulations'],
+            exclude=stats_sources
+        )
+    }
+    needs_realtime = needs_realtime_weather(analysis)
+    comparison_cities = comparison_cities_for(analysis)
+
+    # Météo par coordonnées quand le lieu est connu du gazetteer (sites sans homonyme dans OpenWeatherMap)
+    if needs_realtime:
+        for realtime_city in comparison_cities or [city]:
+            lat, lon = gazetteer.coordinates(realtime_city)
+            tasks[('weather', realtime_city)] = lambda c=realtime_city, la=lat, lo=lon: load_owm_data(
+                weather_cache, "weather", c, la, lo)
+            tasks[('forecast', realtime_city)] = lambda c=realtime_city, la=lat, lo=lon: load_owm_data(
+                weather_cache, "forecast", c, la, lo)
+
+    # Résumé des échanges sortis de la fenêtre, hors du chemin de la requête: le résumé terminé
+    # depuis la question précédente est intégré, le suivant est lancé en arrière-plan
+    if memory is not None:
+        client = get_openai_client().with_options(timeout=HISTORY_SUMMARY_TIMEOUT, max_retries=0)
+        memory.fold_in_background(
+            messages, get_summary_executor(),
+            lambda previous_summary, to_fold: summarize_history(client, previous_summary, to_fold)
+        )
+
+    results, failures = gather_with_deadline(tasks, CONTEXT_FETCH_DEADLINE)
+
+    if memory is not None:
+        summary, history = memory.window(messages)
+    else:
+        summary, history = "", [{'role': m['role'], 'content': m['content']} for m in messages]
+
+    realtime_context = ""
+
+    # 1. Ajouter météo si nécessaire
+    if needs_realtime and comparison_cities:
+        realtime_context += format_weather_comparison({
+            c: (results.get(('weather', c)), results.get(('forecast', c)))
+            for c in comparison_cities
+        })
+    elif needs_realtime:
+        if ('weather', city) in failures:
+            st.warning(f"Données météo indisponibles: {failures[('weather', city)]}")
+            realtime_context += "\n=== DONNEES METEO EN TEMPS REEL (OpenWeatherMap) ===\n"
+            realtime_context += "Données météo indisponibles pour le moment. Ne pas inventer de valeurs.\n\n"
+            if analysis['needs_tide']:
+                realtime_context += format_tides_for_context(get_tide_data(city, *gazetteer.coordinates(city)))
+        else:
+            realtime_context += format_weather_for_context(
+                results[('weather', city)], results.get(('forecast', city)), place=city
+            )
+    elif analysis['needs_tide']:
+        # Les marées sont calculées localement: disponibles même sans clé OpenWeatherMap
+        realtime_context += format_tides_for_context(get_tide_data(city, *gazetteer.coordinates(city)))
+
+    # 2. Ajouter les statistiques calculées, les extraits pertinents pour la question, puis les données
+    # locales filtrées (du plus précis au plus général: en cas de dépassement, la fin du bloc est tronquée)
+    data_context = stats_context + create_retrieval_context(user_question, published.signature, all_data)
+
+    if 'local' in failures:
+        st.warning(f"Données locales indisponibles: {failures['local']}")
+        data_context += "DONNEES DISPONIBLES: indisponibles pour le moment.\n\n"
+    else:
+        data_context += results['local']
 
     # Date et heure actuelles avec jour de la semaine
     now = datetime.now()
@@ -570,9 +778,7 @@ def get_chatbot_response(messages, base_context, user_question):
         else:
             prochains_jours += f"- {jour_nom.upper()} : {future_date.strftime('%d/%m/%Y')}\n"
 
-    system_message = {
-        "role": "system",
-        "content": f"""Tu es SunuPecheNet, assistant expert en pêche au Sénégal.
+    instructions = f"""Tu es SunuPecheNet, assistant expert en pêche au Sénégal.
 
 DATE ET HEURE ACTUELLES: {jour_actuel} {current_datetime}
 
@@ -642,30 +848,99 @@ RÈGLES DE COMBINAISON INTELLIGENTE:
    - TOUJOURS préciser la date complète quand tu parles d'un jour futur
    - Si données manquantes, dis-le clairement
 
-{final_context}
-
-IMPORTANT: Les données ci-dessus sont RÉELLES. Utilise-les intelligemment!"""
-    }
+"""
+    closing = "\n\nIMPORTANT: Les données ci-dessus sont RÉELLES. Utilise-les intelligemment!"
+
+    # Priorités: les données locales sont réduites en premier, puis l'historique, puis le temps réel;
+    # les instructions et la question courante sont toujours conservées
+    builder = PromptBuilder(PROMPT_MAX_TOKENS, model=DEFAULT_MODEL)
+    builder.add_section('instructions', instructions, priority=100)
+    builder.add_section('summary', format_summary_for_context(summary), priority=25)
+    builder.add_section('realtime', realtime_context, priority=30, budget=PROMPT_REALTIME_BUDGET)
+    builder.add_section('data', data_context, priority=10, budget=PROMPT_DATA_BUDGET)
+    builder.add_section('closing', closing, priority=100)
+    builder.set_history(history, priority=20, budget=PROMPT_HISTORY_BUDGET)
+    system_content, history, prompt_report = builder.build()
+
+    if report is not None:
+        report.update(prompt_report)
+        if needs_realtime:
+            report['weather'] = [results.get((endpoint, c))
+                                 for c in comparison_cities or [city] for endpoint in ("weather", "forecast")]
+
+    return [{"role": "system", "content": system_content}] + history
+
+def complete_chat(chat_messages, metrics=None):
+    """
+    Génère la réponse complète pour une liste de messages déjà construite.
+    Si `metrics` est un dict, il reçoit 'duration' en secondes et 'error' en cas d'échec.
+    """
+    client = get_openai_client()
+    start = time.perf_counter()
 
     try:
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[system_message] + messages,
+            model=DEFAULT_MODEL,
+            messages=chat_messages,
             temperature=0.3,
             max_tokens=1500
         )
         return response.choices[0].message.content
     except Exception as e:
+        if metrics is not None:
+            metrics['error'] = str(e)
         return f"Erreur: {e}"
+    finally:
+        if metrics is not None:
+            metrics['duration'] = time.perf_counter() - start
+
+def stream_chatbot_response(chat_messages, metrics=None):
+    """
+    Génère la réponse token par token (générateur de deltas) pour un affichage progressif.
+    Si `metrics` est un dict, il reçoit 'ttft' (délai avant le premier token) et 'duration' en secondes,
+    et 'error' en cas d'échec.
+    """
+    client = get_openai_client()
+    start = time.perf_counter()
+
+    try:
+        stream = client.chat.completions.create(
+            model=DEFAULT_MODEL,
+            messages=chat_messages,
+            temperature=0.3,
+            max_tokens=1500,
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if metrics is not None and 'ttft' not in metrics:
+                metrics['ttft'] = time.perf_counter() - start
+            yield delta
+    except Exception as e:
+        if metrics is not None:
+            metrics['error'] = str(e)
+        yield f"Erreur: {e}"
+    finally:
+        if metrics is not None:
+            metrics['duration'] = time.perf_counter() - start
 
 # ========== INITIALISATION ==========
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Fenêtre glissante + résumé de l'historique, propre à chaque session
+if "history_memory" not in st.session_state:
+    st.session_state.history_memory = ConversationMemory(HISTORY_KEEP_TURNS, HISTORY_FOLD_TURNS)
+
+# Les données ne sont pas copiées dans la session: seule la version vue est mémorisée
 if "data_loaded" not in st.session_state:
     st.session_state.data_loaded = False
-    st.session_state.all_data = {}
+    st.session_state.data_version = None
 
 # ========== SIDEBAR ==========
 
@@ -687,15 +962,19 @@ with st.sidebar:
 
     if st.button("Effacer l'historique"):
         st.session_state.messages = []
+        st.session_state.history_memory = ConversationMemory(HISTORY_KEEP_TURNS, HISTORY_FOLD_TURNS)
         st.rerun()
 
 # ========== CHARGEMENT DONNÉES ==========
 
-if not st.session_state.data_loaded:
-    all_data = load_all_data()
-    st.session_state.all_data = all_data
-    if all_data:
-        st.session_state.data_loaded = True
+# Chaque exécution vérifie la version publiée: un rechargement à chaud est visible dès la question suivante
+published = get_published_data()
+if st.session_state.data_version != published.version:
+    st.session_state.data_version = published.version
+    st.session_state.data_loaded = bool(published.data)
+    for filename, error in published.errors.items():
+        file_type = os.path.splitext(filename)[1].lstrip('.').upper()
+        st.error(f"Erreur {file_type} {filename}: {error}")
 
 # ========== CHAT ==========
 
@@ -709,7 +988,8 @@ if len(st.session_state.messages) == 0:
     welcome_message = "Bienvenue dans le chatbot de SunuPecheNet !"
     with st.chat_message("assistant"):
         st.markdown(welcome_message)
-    st.session_state.messages.append({"role": "assistant", "content": welcome_message})
+    # Message statique: affiché mais jamais envoyé au modèle
+    st.session_state.messages.append({"role": "assistant", "content": welcome_message, "static": True})
 
 if prompt := st.chat_input("Posez votre question..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
@@ -718,17 +998,51 @@ if prompt := st.chat_input("Posez votre question..."):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner("🔍 Analyse intelligente en cours..."):
-            try:
-                response = get_chatbot_response(
-                    st.session_state.messages,
-                    "",  # Le contexte est maintenant géré dans la fonction
-                    prompt
-                )
+        try:
+            # Le cache de réponses est consulté avant de construire le contexte (météo, données, résumé)
+            analysis = analyze_user_question(prompt, published)
+            cache_key = question_cache_key(prompt, analysis, published, st.session_state.messages)
+            response_cache = get_response_cache()
+            cached_response = None
+            if response_cache is not None and cache_key is not None:
+                cached_response = response_cache.get(cache_key)
+
+            # Répartition des tokens du prompt (par section) pour cette requête
+            prompt_tokens = {}
+            metrics = {'cache_hit': cached_response is not None}
+            if cached_response is not None:
+                response = cached_response
                 st.markdown(response)
-            except Exception as e:
-                error_message = f"❌ Une erreur s'est produite : {str(e)}\n\nVeuillez réessayer ou reformuler votre question."
-                st.error(error_message)
-                response = error_message
+            else:
+                with st.spinner("🔍 Analyse intelligente en cours..."):
+                    chat_messages = build_chat_messages(
+                        st.session_state.messages,
+                        "",  # Le contexte est maintenant géré dans la fonction
+                        prompt,
+                        prompt_tokens,
+                        st.session_state.history_memory,
+                        analysis
+                    )
+                # Météo chargée pendant la construction: la clé suit les données utilisées
+                weather = prompt_tokens.pop('weather', None)
+                if response_cache is not None and weather is not None:
+                    cache_key = question_cache_key(prompt, analysis, published, st.session_state.messages, weather)
+                if STREAM_RESPONSES:
+                    response = st.write_stream(stream_chatbot_response(chat_messages, metrics))
+                else:
+                    with st.spinner("🔍 Analyse intelligente en cours..."):
+                        response = complete_chat(chat_messages, metrics)
+                        st.markdown(response)
+
+            # Les réponses en erreur ne sont pas mises en cache
+            cacheable = cache_key is not None and cached_response is None and 'error' not in metrics
+            if response_cache is not None and cacheable:
+                response_cache.set(cache_key, response)
+            st.session_state.last_response_metrics = metrics
+            st.session_state.last_prompt_tokens = prompt_tokens
+        except Exception as e:
+            error_message = f"❌ Une erreur s'est produite : {str(e)}\n\nVeuillez réessayer ou reformuler votre question."
+            st.error(error_message)
+            response = error_message
 
     st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
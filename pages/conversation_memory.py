@@ -0,0 +1,98 @@
+"""
+Historique de conversation envoyé au modèle: fenêtre glissante + résumé des échanges plus anciens
+Fichier: pages/conversation_memory.py
+"""
+
+
+class ConversationMemory:
+    """
+    Mémoire de conversation d'une session (conservée dans st.session_state).
+
+    Les `keep_turns` derniers échanges (question + réponse) sont envoyés tels quels; les plus anciens
+    sont résumés. Le résumé est mis à jour de façon incrémentale: seul le lot de messages qui sort
+    de la fenêtre est résumé, avec le résumé précédent. Les messages sont repliés par lots de
+    `fold_turns` échanges pour ne pas appeler le modèle à chaque question, toujours par échanges complets
+    (la question en cours, encore sans réponse, n'est jamais résumée).
+
+    Le résumé est calculé en arrière-plan (fold_in_background), hors du chemin de la requête: en attendant,
+    les messages du lot restent envoyés tels quels, et un résultat arrivé après la réponse est conservé
+    pour la question suivante au lieu d'être recalculé.
+
+    Les messages marqués 'static' (ex: message de bienvenue) ne font pas partie de l'historique.
+    """
+
+    def __init__(self, keep_turns=6, fold_turns=3):
+        self.keep_turns = keep_turns
+        self.fold_turns = fold_turns
+        self.summary = ""
+        self.folded = 0  # nombre de messages de la conversation déjà intégrés au résumé
+        self._folding = None  # résumé en cours: (nombre de messages du lot, Future)
+
+    @staticmethod
+    def _conversation(messages):
+        return [m for m in messages if not m.get('static')]
+
+    def pending(self, messages):
+        """
+        Messages sortis de la fenêtre et pas encore résumés, si un lot complet est atteint
+        Returns: liste de messages à résumer (vide s'il n'y a rien à faire)
+        """
+        conversation = self._conversation(messages)
+        if len(conversation) < self.folded:
+            # Conversation réinitialisée
+            self.summary, self.folded, self._folding = "", 0, None
+
+        # Échanges complets seulement: la question en cours n'a pas encore de réponse
+        if conversation and conversation[-1]['role'] == 'user':
+            conversation = conversation[:-1]
+
+        keep = 2 * self.keep_turns
+        to_fold = conversation[self.folded:max(self.folded, len(conversation) - keep)]
+        # Le lot se termine sur une réponse: un échange n'est jamais coupé en deux
+        while to_fold and to_fold[-1]['role'] != 'assistant':
+            to_fold.pop()
+        if len(to_fold) < 2 * self.fold_turns:
+            return []
+        return to_fold
+
+    def fold_in_background(self, messages, executor, summarize):
+        """
+        Intègre le résumé terminé depuis la dernière question, puis lance le suivant s'il y a un lot à résumer.
+        summarize(résumé_précédent, messages) -> nouveau résumé ou None, exécutée par `executor`
+        (un seul résumé en cours par conversation)
+        """
+        self.collect()
+        if self._folding is not None:
+            return
+        to_fold = self.pending(messages)
+        if to_fold:
+            self._folding = (len(to_fold), executor.submit(summarize, self.summary, to_fold))
+
+    def collect(self):
+        """Enregistre le résumé calculé en arrière-plan s'il est disponible (sans attendre)"""
+        if self._folding is None or not self._folding[1].done():
+            return
+        count, future = self._folding
+        self._folding = None
+        if future.exception() is None and future.result():
+            self.fold(count, future.result())
+
+    def fold(self, count, summary):
+        """Enregistre le nouveau résumé, qui intègre désormais les `count` messages suivants"""
+        self.summary = summary
+        self.folded += count
+
+    def window(self, messages):
+        """
+        Returns: (résumé des échanges anciens, messages récents au format de l'API)
+        Les messages pas encore résumés restent envoyés tels quels.
+        """
+        recent = self._conversation(messages)[self.folded:]
+        return self.summary, [{'role': m['role'], 'content': m['content']} for m in recent]
+
+
+def format_summary_for_context(summary):
+    """Formate le résumé de la conversation pour le prompt"""
+    if not summary:
+        return ""
+    return f"\n=== RÉSUMÉ DES ÉCHANGES PRÉCÉDENTS ===\n{summary}\n\n"
@@ -0,0 +1,435 @@
+"""
+Lecture des fichiers du dossier data (CSV, PDF, JSON) et instantané disque des données chargées
+Fichier: pages/data_loader.py
+"""
+
+import codecs
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import pickle
+import queue
+import re
+import time
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Types de fichiers chargés, dans l'ordre de chargement
+DATA_FILE_TYPES = ['csv', 'pdf', 'json']
+
+# Version des analyseurs de fichiers, incluse dans le nom des données de l'instantané:
+# à incrémenter à chaque changement du résultat de l'analyse (les instantanés existants sont alors ignorés)
+# 1: analyseurs d'origine; 2: détection d'encodage en une lecture, colonnes catégorielles (CSV_DTYPE_HINTS)
+PARSER_VERSION = 2
+
+# Colonnes à faible cardinalité chargées en catégories (réduit la mémoire des gros journaux de débarquement)
+CSV_DTYPE_HINTS = {
+    'capture_data.csv': {'zone': 'category', 'espece': 'category'},
+    'peche_alertes.csv': {'zone': 'category', 'type_alerte': 'category', 'niveau_danger': 'category'},
+}
+
+# Octets imprimables en cp1252 mais de contrôle en latin-1, et octets non définis en cp1252
+CP1252_SPECIFIC_BYTES = re.compile(rb'[\x80-\x9f]')
+CP1252_UNDEFINED_BYTES = re.compile(rb'[\x81\x8d\x8f\x90\x9d]')
+
+
+# ========== FONCTIONS DE LECTURE DE FICHIERS ==========
+
+def load_pdf_pages_with_llamaindex(pdf_path):
+    """
+    Charge un PDF avec llama-index et retourne le texte de chaque page
+    """
+    # Import local: llama-index est lourd et inutile tant qu'aucun PDF n'est à extraire
+    from llama_index.core import SimpleDirectoryReader
+
+    reader = SimpleDirectoryReader(input_files=[pdf_path])
+    documents = reader.load_data()
+    return [doc.text for doc in documents]
+
+
+def _is_valid_utf8(raw, block_size=64 * 1024):
+    """Validation UTF-8 stricte par blocs (sans construire la chaîne décodée complète)"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    view = memoryview(raw)
+    try:
+        for start in range(0, len(raw), block_size):
+            decoder.decode(view[start:start + block_size])
+        decoder.decode(b'', final=True)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def detect_encoding(raw, sample_size=1024 * 1024):
+    """
+    Détecte l'encodage d'un contenu: BOM, puis UTF-8 strict (sur tout le contenu, pour ne jamais
+    échouer en fin d'analyse), puis cp1252 / latin-1 d'après un échantillon.
+    cp1252 n'est retenu que si l'échantillon contient des octets 0x80-0x9F
+    (€, guillemets, apostrophes typographiques) qui sont des caractères de contrôle en latin-1.
+    """
+    if raw.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    if raw.isascii() or _is_valid_utf8(raw):
+        return 'utf-8'
+    sample = raw[:sample_size]
+    if CP1252_SPECIFIC_BYTES.search(sample) and not CP1252_UNDEFINED_BYTES.search(sample):
+        return 'cp1252'
+    return 'latin-1'
+
+
+def _concat_chunks(chunks):
+    """Concatène des morceaux de DataFrame en conservant les colonnes catégorielles"""
+    if not chunks:
+        return pd.DataFrame()
+    for column in chunks[0].columns:
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([chunk[column] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[column] = chunk[column].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_csv_with_encoding(file_path, dtype=None, chunksize=None):
+    """
+    Charge un CSV en une seule lecture: les octets sont lus une fois, l'encodage est détecté,
+    puis le CSV est analysé depuis la mémoire.
+    - dtype: types de colonnes (par défaut CSV_DTYPE_HINTS selon le nom du fichier)
+    - chunksize: analyse par morceaux de N lignes (limite le pic mémoire du parseur)
+    """
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+
+    encoding = detect_encoding(raw)
+    if dtype is None:
+        dtype = CSV_DTYPE_HINTS.get(os.path.basename(file_path))
+
+    buffer = io.BytesIO(raw)
+    if chunksize is None:
+        return pd.read_csv(buffer, encoding=encoding, dtype=dtype)
+    return _concat_chunks(list(pd.read_csv(buffer, encoding=encoding, dtype=dtype, chunksize=chunksize)))
+
+
+def load_data_file(file_path):
+    """
+    Charge un fichier du dossier data selon son extension.
+    Returns: dict {'type': ..., 'content': ...} (et 'pages' pour les PDF), ou None si le fichier est vide
+    """
+    file_type = os.path.splitext(file_path)[1].lower().lstrip('.')
+
+    if file_type == 'csv':
+        return {'type': 'csv', 'content': load_csv_with_encoding(file_path)}
+
+    if file_type == 'pdf':
+        pages = load_pdf_pages_with_llamaindex(file_path)
+        text = "\n".join(pages)
+        if not text:
+            return None
+        return {'type': 'pdf', 'content': text, 'pages': pages}
+
+    if file_type == 'json':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return {'type': 'json', 'content': json.load(f)}
+
+    raise ValueError(f"Type de fichier non supporté: {file_path}")
+
+
+def list_data_files(data_folder):
+    """
+    Liste les fichiers à charger: d'abord les CSV, puis les PDF, puis les JSON
+    """
+    files = []
+    for file_type in DATA_FILE_TYPES:
+        files.extend(sorted(glob.glob(os.path.join(data_folder, f'*.{file_type}'))))
+    return files
+
+
+# ========== CHARGEMENT PARALLÈLE ==========
+
+# Dans un processus du pool: file où signaler la prise en charge de chaque fichier (voir _run_pool)
+_started_files = None
+
+
+def _init_worker(started_files):
+    global _started_files
+    _started_files = started_files
+
+
+def _load_file_task(file_path):
+    """Tâche exécutée dans un processus du pool: les erreurs sont renvoyées sous forme de texte"""
+    if _started_files is not None:
+        # Heure murale: commune au processus principal et aux processus du pool
+        _started_files.put((file_path, time.time()))
+    try:
+        return 'ok', load_data_file(file_path)
+    except Exception as e:
+        return 'error', str(e)
+
+
+def _needs_process(file_path, min_bytes):
+    """Les PDF et les gros CSV/JSON sont analysés dans le pool, les petits fichiers sur place"""
+    return file_path.lower().endswith('.pdf') or os.path.getsize(file_path) >= min_bytes
+
+
+def _run_pool(files, processes, timeout, report, local_files=()):
+    """
+    Analyse des fichiers dans un pool de processus, chacun avec son propre délai compté depuis
+    sa prise en charge par un processus (les fichiers en attente d'un processus libre ne sont pas pénalisés).
+    Un fichier qui dépasse le délai est reporté en erreur et le pool est arrêté: il n'y a pas d'autre moyen
+    d'interrompre l'analyse bloquée.
+    `local_files` sont analysés sur place pendant que le pool travaille.
+    Returns: fichiers non terminés à relancer dans un nouveau pool (liste vide quand tout est traité)
+    """
+    # 'spawn' : pas de fork d'un processus Streamlit multi-thread
+    context = multiprocessing.get_context('spawn')
+    started_files = context.Queue()
+    pool = context.Pool(min(processes, len(files)), initializer=_init_worker, initargs=(started_files,))
+    try:
+        pending = {f: pool.apply_async(_load_file_task, (f,)) for f in files}
+        for file_path in local_files:
+            report(file_path, _load_file_task(file_path))
+
+        deadlines = {}
+        while pending:
+            try:
+                file_path, started_at = started_files.get(timeout=0.05)
+                deadlines[file_path] = started_at + timeout if timeout is not None else None
+                continue
+            except queue.Empty:
+                pass
+
+            for file_path, async_result in list(pending.items()):
+                if not async_result.ready():
+                    continue
+                del pending[file_path]
+                try:
+                    report(file_path, async_result.get())
+                except Exception as e:
+                    # Résultat non transmissible (MaybeEncodingError), processus arrêté...: seul ce fichier échoue
+                    report(file_path, ('error', f"échec de l'analyse en sous-processus: {e}"))
+
+            now = time.time()
+            expired = [f for f in pending if deadlines.get(f) is not None and now > deadlines[f]]
+            if expired:
+                for file_path in expired:
+                    del pending[file_path]
+                    report(file_path, ('error', f"délai de {timeout:g}s dépassé"))
+                return list(pending)
+        return []
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def load_data_files(files, workers=1, timeout=None, min_bytes=5 * 1024 * 1024, progress=None):
+    """
+    Charge une liste de fichiers, en répartissant les PDF et les gros fichiers sur un pool de processus.
+    - workers: nombre de processus (1 = chargement séquentiel, résultat identique)
+    - timeout: délai maximal (secondes) d'analyse de chaque fichier confié au pool, compté depuis sa prise
+      en charge par un processus; un fichier qui le dépasse est reporté en erreur, les autres sont analysés
+      dans un nouveau pool
+    - progress(fichiers_traités, total, chemin): appelé après chaque fichier
+    Returns: (données {chemin: data_info}, erreurs {chemin: message}), dans l'ordre de `files`
+    """
+    outcomes = {}
+    done = 0
+
+    def report(file_path, outcome):
+        nonlocal done
+        outcomes[file_path] = outcome
+        done += 1
+        if progress:
+            progress(done, len(files), file_path)
+
+    parallel_files = [f for f in files if _needs_process(f, min_bytes)] if workers > 1 else []
+    local_files = [f for f in files if f not in parallel_files]
+
+    if not parallel_files:
+        for file_path in local_files:
+            report(file_path, _load_file_task(file_path))
+
+    # Les petits fichiers sont analysés sur place pendant que le premier pool travaille
+    while parallel_files:
+        parallel_files = _run_pool(parallel_files, workers, timeout, report, local_files)
+        local_files = ()
+
+    results, errors = {}, {}
+    for file_path in files:
+        status, value = outcomes[file_path]
+        if status == 'ok':
+            if value is not None:
+                results[file_path] = value
+        else:
+            errors[file_path] = value
+    return results, errors
+
+
+def ingest_data_files(files, snapshot, workers=1, timeout=None, progress=None, prepare=None):
+    """
+    Charge des fichiers en réutilisant l'instantané disque: seuls les fichiers absents de l'instantané
+    sont analysés (via load_data_files), puis ajoutés à l'instantané.
+    `prepare(nom_fichier, data_info)` complète chaque entrée chargée (ex: extrait de contexte précalculé).
+    Returns: (données {chemin: data_info}, erreurs {chemin: message})
+    """
+    loaded, to_parse = {}, []
+    for file_path in files:
+        try:
+            data_info = snapshot.load(file_path)
+        except OSError:
+            data_info = None
+        if data_info is None:
+            to_parse.append(file_path)
+        else:
+            loaded[file_path] = data_info
+
+    errors = {}
+    if to_parse:
+        parsed, errors = load_data_files(to_parse, workers=workers, timeout=timeout, progress=progress)
+        for file_path, data_info in parsed.items():
+            loaded[file_path] = data_info
+            try:
+                snapshot.store(file_path, data_info)
+            except OSError as e:
+                print(f"Impossible d'enregistrer l'instantané de {file_path}: {e}")
+
+    if prepare:
+        for file_path, data_info in loaded.items():
+            prepare(os.path.basename(file_path), data_info)
+
+    return loaded, errors
+
+
+def scan_data_files(data_folder):
+    """État des fichiers à charger: {chemin: (taille, mtime_ns)}, dans l'ordre de list_data_files"""
+    stats = {}
+    for file_path in list_data_files(data_folder):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        stats[file_path] = (stat.st_size, stat.st_mtime_ns)
+    return stats
+
+
+def files_signature(file_stats):
+    """Empreinte d'un état de fichiers {chemin: (taille, mtime_ns)}"""
+    entries = sorted([os.path.basename(path), size, mtime] for path, (size, mtime) in file_stats.items())
+    return hashlib.sha1(json.dumps(entries).encode('utf-8')).hexdigest()[:16]
+
+
+# ========== INSTANTANÉ DISQUE ==========
+
+def file_sha1(file_path):
+    """Empreinte SHA-1 du contenu d'un fichier"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DataSnapshot:
+    """
+    Instantané disque des fichiers déjà analysés (DataFrames, pages de PDF, JSON), au format pickle.
+
+    Le manifeste associe chaque fichier à (taille, mtime, sha1). Un fichier inchangé
+    (même taille et même mtime) est relu depuis l'instantané sans être haché ni réanalysé ;
+    si seuls la date ou le chemin ont changé, le hash permet encore de réutiliser l'instantané.
+    Les données sont nommées par sha1 et version des analyseurs (PARSER_VERSION): un changement
+    d'analyseur invalide l'instantané.
+    """
+
+    def __init__(self, snapshot_dir, version=PARSER_VERSION):
+        self.snapshot_dir = snapshot_dir
+        self.version = version
+        self.manifest_path = os.path.join(snapshot_dir, 'manifest.json')
+        self.stats = {'hits': 0, 'misses': 0}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self._dirty = False
+
+    def _blob_path(self, sha1):
+        return os.path.join(self.snapshot_dir, self._blob_name(sha1))
+
+    def _blob_name(self, sha1):
+        return f"{sha1}-v{self.version}.pkl"
+
+    def load(self, file_path):
+        """Retourne les données de l'instantané pour ce fichier, ou None s'il doit être réanalysé"""
+        key = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        entry = self.manifest.get(key)
+
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            sha1 = entry['sha1']
+        else:
+            sha1 = file_sha1(file_path)
+            if not os.path.exists(self._blob_path(sha1)):
+                self.stats['misses'] += 1
+                return None
+            self.manifest[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1}
+            self._dirty = True
+
+        try:
+            with open(self._blob_path(sha1), 'rb') as f:
+                data_info = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.stats['misses'] += 1
+            return None
+
+        self.stats['hits'] += 1
+        return data_info
+
+    def store(self, file_path, data_info):
+        """Enregistre les données analysées d'un fichier dans l'instantané"""
+        stat = os.stat(file_path)
+        sha1 = file_sha1(file_path)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+        tmp_path = self._blob_path(sha1) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data_info, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._blob_path(sha1))
+
+        self.manifest[os.path.abspath(file_path)] = {
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1
+        }
+        self._dirty = True
+
+    def save(self, keep_files=None):
+        """
+        Écrit le manifeste. Si keep_files est fourni, les entrées des fichiers supprimés
+        et les données qui ne sont plus référencées sont effacées.
+        """
+        if keep_files is not None:
+            keep = {os.path.abspath(f) for f in keep_files}
+            for key in list(self.manifest):
+                if key not in keep:
+                    del self.manifest[key]
+                    self._dirty = True
+        if not self._dirty:
+            return
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._dirty = False
+
+        if keep_files is not None:
+            referenced = {self._blob_name(entry['sha1']) for entry in self.manifest.values()}
+            for name in os.listdir(self.snapshot_dir):
+                if name.endswith('.pkl') and name not in referenced:
+                    try:
+                        os.remove(os.path.join(self.snapshot_dir, name))
+                    except OSError:
+                        pass
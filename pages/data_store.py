@@ -0,0 +1,120 @@
+"""
+Données partagées par le processus: surveillance du dossier data et rechargement à chaud
+Fichier: pages/data_store.py
+"""
+
+import os
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from data_loader import DataSnapshot, files_signature, ingest_data_files, scan_data_files
+
+# Jeu de données publié: jamais modifié après publication, remplacé d'un bloc à chaque rechargement.
+# Une seule copie par processus, référencée par toutes les sessions.
+PublishedData = namedtuple('PublishedData', ['version', 'data', 'signature', 'errors'])
+
+EMPTY_DATA = PublishedData(0, MappingProxyType({}), None, MappingProxyType({}))
+
+
+class DataWatcher:
+    """
+    Surveille le dossier data par scrutation périodique (taille et date de modification des fichiers)
+    et ne recharge que les fichiers ajoutés ou modifiés; les fichiers supprimés sont retirés.
+
+    Le nouveau jeu de données est publié par une simple affectation de `current`:
+    les requêtes en cours continuent avec la version qu'elles ont lue, les suivantes voient la nouvelle.
+    """
+
+    def __init__(self, data_folder, snapshot_dir, workers=1, timeout=None, prepare=None, poll_interval=5.0):
+        self.data_folder = data_folder
+        self.snapshot = DataSnapshot(snapshot_dir)
+        self.workers = workers
+        self.timeout = timeout
+        self.prepare = prepare
+        self.poll_interval = poll_interval
+        self.current = EMPTY_DATA
+
+        self._entries = {}     # chemin -> data_info de la version publiée
+        self._file_stats = {}  # chemin -> (taille, mtime_ns) des fichiers publiés
+        self._failed = {}      # chemin -> ((taille, mtime_ns), erreur) des fichiers en erreur (réessayés s'ils changent)
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self, progress=None):
+        """
+        Recharge les fichiers ajoutés ou modifiés depuis la dernière publication.
+        Returns: True si une nouvelle version a été publiée
+        """
+        with self._refresh_lock:
+            current_stats = scan_data_files(self.data_folder)
+            changed = [
+                path for path, stat in current_stats.items()
+                if self._file_stats.get(path) != stat and self._failed.get(path, (None,))[0] != stat
+            ]
+            # Fichiers publiés ou en erreur disparus du dossier
+            removed = [path for path in {**self._file_stats, **self._failed} if path not in current_stats]
+            if not changed and not removed and self.current.version > 0:
+                return False
+
+            loaded, errors = ingest_data_files(
+                changed, self.snapshot,
+                workers=self.workers, timeout=self.timeout, progress=progress, prepare=self.prepare
+            )
+
+            entries = {path: info for path, info in self._entries.items() if path in current_stats}
+            entries.update(loaded)
+            file_stats = {path: stat for path, stat in self._file_stats.items() if path in current_stats}
+            for path in loaded:
+                file_stats[path] = current_stats[path]
+
+            # Un fichier en erreur (ex: en cours de copie) garde sa version précédente. Les échecs
+            # des passes précédentes non réessayés (fichier inchangé) sont conservés: sinon le fichier
+            # serait réanalysé et une nouvelle version publiée à chaque scrutation
+            failed = {
+                path: failure for path, failure in self._failed.items()
+                if path in current_stats and path not in loaded
+            }
+            failed.update({path: (current_stats[path], error) for path, error in errors.items()})
+            self._failed = failed
+
+            try:
+                self.snapshot.save(keep_files=list(current_stats))
+            except OSError as e:
+                print(f"Impossible d'enregistrer l'instantané des données: {e}")
+
+            self._entries = entries
+            self._file_stats = file_stats
+            # Vues en lecture seule: une session ne peut pas modifier les données partagées
+            self.current = PublishedData(
+                version=self.current.version + 1,
+                data=MappingProxyType({
+                    os.path.basename(path): MappingProxyType(entries[path])
+                    for path in current_stats if path in entries
+                }),
+                signature=files_signature(file_stats),
+                errors=MappingProxyType({os.path.basename(path): error for path, (_, error) in failed.items()})
+            )
+            return True
+
+    def start(self):
+        """Démarre la scrutation en arrière-plan (poll_interval <= 0 la désactive)"""
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête la scrutation"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Erreur lors du rechargement des données: {e}")
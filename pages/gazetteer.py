@@ -0,0 +1,124 @@
+"""
+Index des lieux de pêche (sites de débarquement, villes, régions) cités dans les questions
+Fichier: pages/gazetteer.py
+"""
+
+from collections import namedtuple
+
+from question_analysis import CITY_ALIASES, build_question_matcher
+from retrieval import fold_text
+
+Place = namedtuple('Place', ['name', 'kind', 'region', 'lat', 'lon'])
+
+# Coordonnées approximatives (lat, lon) et région administrative des lieux connus.
+# Les fichiers de données ne donnent que des noms: un lieu sans coordonnées est interrogé par son nom.
+PLACE_COORDINATES = {
+    # Villes et régions
+    'Dakar': (14.6928, -17.4467, 'Dakar'),
+    'Saint-Louis': (16.0179, -16.4896, 'Saint-Louis'),
+    'Thiès': (14.7910, -16.9359, 'Thiès'),
+    'Mbour': (14.4199, -16.9640, 'Thiès'),
+    'Joal-Fadiouth': (14.1667, -16.8333, 'Thiès'),
+    'Kayar': (14.9186, -17.1206, 'Thiès'),
+    'Ziguinchor': (12.5681, -16.2719, 'Ziguinchor'),
+    'Kaolack': (14.1520, -16.0726, 'Kaolack'),
+    'Fatick': (14.3390, -16.4111, 'Fatick'),
+    'Louga': (15.6144, -16.2286, 'Louga'),
+    # Sites de débarquement
+    'Ouakam': (14.7236, -17.4890, 'Dakar'),
+    'Ngor': (14.7500, -17.5150, 'Dakar'),
+    'Yoff': (14.7600, -17.4700, 'Dakar'),
+    'Soumbédioune': (14.6800, -17.4660, 'Dakar'),
+    'Anse Bernard': (14.6640, -17.4330, 'Dakar'),
+    'Rufisque': (14.7160, -17.2730, 'Dakar'),
+    'Thiaroye-sur-mer': (14.7450, -17.3780, 'Dakar'),
+    'Bargny': (14.6970, -17.2290, 'Dakar'),
+    'Toubab Dialaw': (14.6040, -17.1470, 'Thiès'),
+    'Ndayane': (14.5560, -17.1260, 'Thiès'),
+    'Popenguine': (14.5530, -17.1120, 'Thiès'),
+    'Guéréo': (14.5290, -17.0900, 'Thiès'),
+    'La Somone': (14.4870, -17.0860, 'Thiès'),
+    'Somone': (14.4870, -17.0860, 'Thiès'),
+    'Ngaparou': (14.4620, -17.0590, 'Thiès'),
+    'Saly': (14.4470, -17.0160, 'Thiès'),
+    'Terrou Baye Sogui': (14.4130, -16.9680, 'Thiès'),
+    'Fass-Boye': (15.0970, -16.9160, 'Thiès'),
+    'Cap Skirring': (12.3930, -16.7460, 'Ziguinchor'),
+    'Kafountine': (12.9300, -16.7500, 'Ziguinchor'),
+}
+
+# Variantes d'écriture supplémentaires (le nom lui-même, sans accents, est toujours reconnu)
+PLACE_ALIASES = {
+    **CITY_ALIASES,
+    'Thiaroye-sur-mer': ['thiaroye'],
+    'La Somone': ['somone'],
+    'Cap Skirring': ['cap skiring'],
+    'Soumbédioune': ['soumbedioune', 'soumbedioun'],
+}
+
+# Agrégats à ne pas traiter comme des lieux
+IGNORED_REGIONS = {'total_national', 'total'}
+
+
+def _iter_json_places(node):
+    """Parcourt un document JSON: clés d'un objet 'sites' (sites de pêche) et valeurs des champs 'region'"""
+    if isinstance(node, dict):
+        sites = node.get('sites')
+        if isinstance(sites, dict):
+            for name in sites:
+                yield name, 'site'
+        region = node.get('region')
+        if isinstance(region, str):
+            yield region, 'region'
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                yield from _iter_json_places(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _iter_json_places(item)
+
+
+class Gazetteer:
+    """
+    Lieux connus (nom officiel -> Place) et analyseur de questions qui les reconnaît
+    en même temps que les besoins, en une seule passe sur la question.
+    """
+
+    def __init__(self, places, aliases):
+        self.places = places
+        self.matcher = build_question_matcher(aliases)
+
+    def get(self, name):
+        """Place correspondant à un nom officiel (None si inconnu)"""
+        return self.places.get(name)
+
+    def coordinates(self, name):
+        """(lat, lon) d'un lieu, ou (None, None) si elles sont inconnues"""
+        place = self.places.get(name)
+        if place is None:
+            return None, None
+        return place.lat, place.lon
+
+    def __len__(self):
+        return len(self.places)
+
+
+def build_gazetteer(all_data):
+    """
+    Construit l'index des lieux: villes connues, sites de débarquement (objet 'sites' des JSON,
+    ex: sites_peche_ultra_nettoye.json) et régions (champs 'region', ex: rapport_mpe_2019_A1_optimise.json)
+    """
+    found = [(name, 'ville') for name in CITY_ALIASES]
+    for data_info in all_data.values():
+        if data_info['type'] == 'json':
+            found.extend(_iter_json_places(data_info['content']))
+
+    places, aliases = {}, {}
+    for name, kind in found:
+        name = name.strip()
+        if not name or fold_text(name) in IGNORED_REGIONS or name in places:
+            continue
+        lat, lon, region = PLACE_COORDINATES.get(name, (None, None, None))
+        places[name] = Place(name, kind, region or (name if kind == 'region' else None), lat, lon)
+        aliases[name] = [name] + PLACE_ALIASES.get(name, [])
+    return Gazetteer(places, aliases)
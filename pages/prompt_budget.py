@@ -0,0 +1,147 @@
+"""
+Comptage des tokens et construction du prompt sous budget
+Fichier: pages/prompt_budget.py
+"""
+
+import math
+from functools import lru_cache
+
+# Coût fixe d'un message dans le format chat d'OpenAI (rôle + délimiteurs), et amorce de la réponse
+TOKENS_PER_MESSAGE = 4
+TOKENS_REPLY_PRIMING = 3
+
+TRUNCATION_MARK = "\n[... tronqué pour respecter le budget de tokens]\n"
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model):
+    """
+    Encodage tiktoken du modèle (o200k_base par défaut), ou None si tiktoken
+    ou ses fichiers d'encodage ne sont pas disponibles hors ligne
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Pas d'accès réseau et pas de cache local (TIKTOKEN_CACHE_DIR)
+        return None
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """Nombre de tokens d'un texte (exact avec tiktoken, sinon estimation ~4 caractères par token)"""
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, model="gpt-4o-mini"):
+    """Tronque un texte à max_tokens tokens (marque de troncature comprise)"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    keep = max(0, max_tokens - count_tokens(TRUNCATION_MARK, model))
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:keep * 4] + TRUNCATION_MARK
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:keep]) + TRUNCATION_MARK
+
+
+def count_message_tokens(messages, model="gpt-4o-mini"):
+    """Nombre de tokens d'une liste de messages chat (contenu + coût fixe par message)"""
+    return sum(count_tokens(m['content'], model) + TOKENS_PER_MESSAGE for m in messages)
+
+
+class PromptBuilder:
+    """
+    Assemble le prompt système (sections de texte) et l'historique sous un budget total de tokens.
+
+    Chaque section a une priorité (les plus basses sont réduites en premier) et un budget propre
+    optionnel. Les sections de texte sont tronquées par la fin (les extraits les moins pertinents
+    sont placés en dernier); l'historique perd ses messages les plus anciens, le dernier message
+    (la question courante) est toujours conservé.
+    """
+
+    def __init__(self, max_tokens, model="gpt-4o-mini"):
+        self.max_tokens = max_tokens
+        self.model = model
+        self.sections = []
+        self.history = None
+
+    def add_section(self, name, text, priority, budget=None):
+        """Ajoute une section au prompt système (dans l'ordre d'ajout)"""
+        self.sections.append({
+            'name': name, 'text': text, 'priority': priority, 'budget': budget,
+            'tokens': count_tokens(text, self.model), 'trimmed': False
+        })
+
+    def set_history(self, messages, priority, budget=None):
+        """Définit l'historique de conversation envoyé après le prompt système"""
+        self.history = {
+            'name': 'history', 'messages': list(messages), 'priority': priority, 'budget': budget,
+            'costs': [count_tokens(m['content'], self.model) + TOKENS_PER_MESSAGE for m in messages],
+            'trimmed': False
+        }
+
+    def _trim_section(self, section, max_tokens):
+        section['text'] = truncate_to_tokens(section['text'], max_tokens, self.model)
+        section['tokens'] = count_tokens(section['text'], self.model)
+        section['trimmed'] = True
+
+    def _trim_history(self, max_tokens):
+        history = self.history
+        while len(history['messages']) > 1 and sum(history['costs']) > max_tokens:
+            history['messages'].pop(0)
+            history['costs'].pop(0)
+            history['trimmed'] = True
+
+    def _history_tokens(self):
+        return sum(self.history['costs']) if self.history else 0
+
+    def _total(self):
+        # Le prompt système est lui-même un message
+        system_tokens = sum(s['tokens'] for s in self.sections) + TOKENS_PER_MESSAGE
+        return system_tokens + self._history_tokens() + TOKENS_REPLY_PRIMING
+
+    def build(self):
+        """
+        Applique les budgets et retourne (contenu du prompt système, messages d'historique, rapport)
+        Le rapport donne les tokens par section, le total, le budget et les sections réduites.
+        """
+        # 1. Budget propre de chaque section
+        for section in self.sections:
+            if section['budget'] is not None and section['tokens'] > section['budget']:
+                self._trim_section(section, section['budget'])
+        if self.history and self.history['budget'] is not None:
+            self._trim_history(self.history['budget'])
+
+        # 2. Budget total: réduire les parties les moins prioritaires d'abord
+        parts = self.sections + ([self.history] if self.history else [])
+        for part in sorted(parts, key=lambda p: p['priority']):
+            excess = self._total() - self.max_tokens
+            if excess <= 0:
+                break
+            if part is self.history:
+                self._trim_history(self._history_tokens() - excess)
+            else:
+                self._trim_section(part, part['tokens'] - excess)
+
+        report = {s['name']: s['tokens'] for s in self.sections}
+        report['history'] = self._history_tokens()
+        report['total'] = self._total()
+        report['budget'] = self.max_tokens
+        report['trimmed'] = [p['name'] for p in parts if p['trimmed']]
+
+        system_content = "".join(s['text'] for s in self.sections)
+        messages = self.history['messages'] if self.history else []
+        return system_content, messages, report
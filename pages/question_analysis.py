@@ -0,0 +1,185 @@
+"""
+Analyse des questions: détection des besoins (météo, marées, statistiques...) et des villes citées
+Fichier: pages/question_analysis.py
+"""
+
+import re
+
+from retrieval import fold_text
+
+# Mots-clés par besoin, sans accents (la question est normalisée de la même façon).
+# Un mot-clé correspond à un mot entier, pluriel en -s/-x compris; "*" final = préfixe ("peche*" -> pêcheur).
+# Les noms composés s'écrivent avec un espace et reconnaissent aussi le tiret ("saint louis" -> "Saint-Louis")
+INTENT_KEYWORDS = {
+    # Mots-clés météo
+    'weather': ['meteo', 'temps', 'temperature', 'vent', 'pluie', 'soleil', 'nuage*', 'prevision*',
+                'condition*'],
+    # Mots-clés marée
+    'tide': ['maree', 'haute', 'basse', 'flux', 'horaire', 'moment', 'quand'],
+    # Mots-clés pêche (besoin de combiner météo + marée)
+    'fishing': ['peche*', 'partir', 'sortie', 'sortir', 'aller', 'allez', 'conseil*', 'recommand*'],
+    # Mots-clés statistiques
+    'statistics': ['statisti*', 'donnee', 'capture*', 'debarqu*', 'tendance', 'volume', 'tonnage'],
+    # Mots-clés espèces
+    'species': ['thiof', 'sardinelle', 'capitaine', 'poisson', 'espece', 'prix', 'valeur', 'quota'],
+    # Mots-clés réglementation
+    'regulations': ['regle*', 'loi', 'interdit*', 'autoris*', 'permis', 'licence'],
+    # Mots-clés plateforme
+    'platform': ['sunupechenet', 'pechenet', 'sunu', 'plateforme', 'application', 'app',
+                 'fonctionnalite', 'comment', 'utilise*'],
+    # Mots-clés comparaison
+    'comparison': ['compar*', 'difference', 'meilleur*', 'vs', 'versus', 'entre'],
+}
+
+# Villes reconnues par défaut: nom officiel -> variantes d'écriture
+# (le gazetteer construit à partir des données y ajoute les sites de débarquement et les régions)
+CITY_ALIASES = {
+    'Dakar': ['dakar'],
+    'Saint-Louis': ['saint louis', 'st louis', 'ndar'],
+    'Thiès': ['thies'],
+    'Mbour': ['mbour'],
+    'Joal-Fadiouth': ['joal', 'joal fadiouth'],
+    'Ziguinchor': ['ziguinchor'],
+    'Kayar': ['kayar', 'cayar'],
+    'Kaolack': ['kaolack'],
+}
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class KeywordMatcher:
+    """
+    Reconnaît en une seule passe tous les libellés d'un texte (mots entiers uniquement).
+    Les mots-clés de tous les groupes sont compilés en tables de correspondance: le texte est découpé
+    en mots une fois, puis chaque mot est résolu par des recherches dans des dictionnaires
+    (noms composés d'abord, puis mot exact, puis préfixe). La résolution d'un mot est mémorisée.
+    """
+
+    def __init__(self, groups, max_cached_words=50000):
+        self._words = {}      # mot -> libellé (pluriels -s/-x inclus)
+        self._compounds = {}  # premier mot -> [(mots suivants, libellé)], les plus longs d'abord
+        self._prefixes = {}   # préfixe d'un mot -> libellé
+        for label, keywords in groups.items():
+            for keyword in keywords:
+                words = tuple(WORD_PATTERN.findall(fold_text(keyword.rstrip('*'))))
+                if keyword.endswith('*'):
+                    self._prefixes.setdefault(words[-1], label)
+                    continue
+                for suffix in ('', 's', 'x'):
+                    variant = words[:-1] + (words[-1] + suffix,)
+                    if len(variant) == 1:
+                        self._words.setdefault(variant[0], label)
+                    else:
+                        self._compounds.setdefault(variant[0], []).append((variant[1:], label))
+        for candidates in self._compounds.values():
+            candidates.sort(key=lambda candidate: -len(candidate[0]))
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefixes}, reverse=True)
+        self._cache = {}
+        self._max_cached_words = max_cached_words
+
+    def find(self, text):
+        """Libellés trouvés dans le texte, dans l'ordre de première apparition et sans doublons"""
+        words = WORD_PATTERN.findall(fold_text(text))
+        found = []
+        i = 0
+        while i < len(words):
+            label, length = None, 1
+            for rest, compound_label in self._compounds.get(words[i], ()):
+                if tuple(words[i + 1:i + 1 + len(rest)]) == rest:
+                    label, length = compound_label, 1 + len(rest)
+                    break
+            else:
+                label = self._match_word(words[i])
+            if label is not None and label not in found:
+                found.append(label)
+            i += length
+        return found
+
+    def _match_word(self, word):
+        try:
+            return self._cache[word]
+        except KeyError:
+            pass
+        label = self._words.get(word)
+        if label is None:
+            for length in self._prefix_lengths:
+                if length <= len(word):
+                    label = self._prefixes.get(word[:length])
+                    if label is not None:
+                        break
+        if len(self._cache) >= self._max_cached_words:
+            self._cache.clear()
+        self._cache[word] = label
+        return label
+
+
+def build_question_matcher(place_aliases):
+    """Analyseur qui trouve les besoins et les lieux ({nom officiel: variantes}) dans la même passe"""
+    return KeywordMatcher({
+        **{('intent', intent): words for intent, words in INTENT_KEYWORDS.items()},
+        **{('city', name): aliases for name, aliases in place_aliases.items()},
+    })
+
+
+# Construit une fois à l'import, utilisé tant que le gazetteer des données n'est pas disponible
+QUESTION_MATCHER = build_question_matcher(CITY_ALIASES)
+
+
+def analyze_question_type(question, matcher=None):
+    """
+    Analyse intelligemment le type de question pour déterminer quelles données utiliser
+    matcher: analyseur à utiliser (ex: celui du gazetteer), QUESTION_MATCHER par défaut
+    Returns: dict avec les flags nécessaires
+    """
+    found = (matcher or QUESTION_MATCHER).find(question)
+    intents = {value for kind, value in found if kind == 'intent'}
+
+    analysis = {
+        'needs_weather': False,
+        'needs_tide': False,
+        'needs_statistics': False,
+        'needs_species': False,
+        'needs_regulations': False,
+        'needs_platform_info': False,
+        'needs_comparison': False,
+        'city': None,
+        # Toutes les villes citées (dans l'ordre, sans doublons) pour les comparaisons
+        'cities': [value for kind, value in found if kind == 'city']
+    }
+
+    # Détection des besoins
+    if 'weather' in intents:
+        analysis['needs_weather'] = True
+
+    if 'tide' in intents:
+        analysis['needs_tide'] = True
+
+    if 'fishing' in intents:
+        analysis['needs_weather'] = True
+        analysis['needs_tide'] = True
+
+    if 'statistics' in intents:
+        analysis['needs_statistics'] = True
+
+    if 'species' in intents:
+        analysis['needs_species'] = True
+        analysis['needs_statistics'] = True  # Souvent liées
+
+    if 'regulations' in intents:
+        analysis['needs_regulations'] = True
+
+    if 'platform' in intents:
+        analysis['needs_platform_info'] = True
+
+    if 'comparison' in intents:
+        analysis['needs_comparison'] = True
+        analysis['needs_statistics'] = True
+        analysis['needs_weather'] = True
+
+    if analysis['cities']:
+        analysis['city'] = analysis['cities'][0]
+    else:
+        analysis['city'] = "Dakar"  # Par défaut
+
+    return analysis
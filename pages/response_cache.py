@@ -0,0 +1,95 @@
+"""
+Cache des réponses du modèle pour les questions répétées
+Fichier: pages/response_cache.py
+"""
+
+import hashlib
+import json
+import threading
+
+from retrieval import TOKEN_PATTERN, fold_text
+from ttl_cache import TTLCache
+
+
+def normalize_question(question):
+    """
+    Forme normalisée d'une question: minuscules, sans accents ni ponctuation, espaces réduits.
+    L'ordre des mots et les mots vides sont conservés: "pêcher demain" et "ne pas pêcher demain"
+    n'ont pas la même clé.
+    """
+    return " ".join(TOKEN_PATTERN.findall(fold_text(question)))
+
+
+def response_cache_key(question, analysis, data_version, day, weather=None, history=()):
+    """
+    Clé de cache d'une réponse: question normalisée, analyse de la question, version des données,
+    jour courant, données météo utilisées (la clé change quand OpenWeatherMap renvoie d'autres valeurs)
+    et échanges précédant la question: une question de suivi ("et demain ?") ne réutilise pas
+    la réponse d'une autre conversation.
+    """
+    payload = json.dumps({
+        'question': normalize_question(question),
+        'analysis': analysis,
+        'data': data_version,
+        'day': day,
+        'weather': weather,
+        'history': [[m['role'], m['content']] for m in history]
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache des réponses à deux niveaux:
+    - mémoire du processus (TTL + éviction LRU),
+    - optionnellement PostgreSQL via ChatHistoryDB (`store`), partagé entre les réplicas.
+    Une réponse trouvée en base est recopiée en mémoire.
+    """
+
+    def __init__(self, ttl, maxsize=None, store=None, purge_every=100):
+        self.ttl = ttl
+        self.memory = TTLCache(ttl, maxsize=maxsize)
+        self.store = store
+        self.purge_every = purge_every
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'store_hits': 0, 'misses': 0, 'stores': 0}
+
+    def get(self, key):
+        """Retourne la réponse en cache, ou None"""
+        response = self.memory.get(key)
+        if response is not None:
+            self._count('hits')
+            return response
+
+        if self.store is not None:
+            response = self.store.get_cached_response(key, self.ttl)
+            if response is not None:
+                self.memory.set(key, response)
+                self._count('store_hits')
+                return response
+
+        self._count('misses')
+        return None
+
+    def set(self, key, response):
+        """Enregistre une réponse"""
+        self.memory.set(key, response)
+        stores = self._count('stores')
+        if self.store is not None:
+            self.store.save_cached_response(key, response)
+            if stores % self.purge_every == 0:
+                self.store.purge_response_cache(self.ttl)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+            return self._stats[name]
+
+    def stats(self):
+        """Compteurs de succès (mémoire, base), d'échecs, taille et taux de succès"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['size'] = self.memory.stats()['size']
+        lookups = stats['hits'] + stats['store_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['store_hits']) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,214 @@
+"""
+Index de recherche lexicale BM25 (hors ligne) sur les données du dossier data
+Fichier: pages/retrieval.py
+"""
+
+import heapq
+import math
+import os
+import pickle
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+# Mots vides français ignorés à l'indexation et à la recherche
+STOPWORDS = {
+    'au', 'aux', 'avec', 'ce', 'ces', 'dans', 'de', 'des', 'du', 'elle', 'en', 'et', 'eux', 'il',
+    'je', 'la', 'le', 'les', 'leur', 'lui', 'ma', 'mais', 'me', 'meme', 'mes', 'moi', 'mon', 'ne',
+    'nos', 'notre', 'nous', 'on', 'ou', 'par', 'pas', 'pour', 'qu', 'que', 'qui', 'sa', 'se', 'ses',
+    'son', 'sur', 'ta', 'te', 'tes', 'toi', 'ton', 'tu', 'un', 'une', 'vos', 'votre', 'vous', 'est',
+    'sont', 'quel', 'quelle', 'quels', 'quelles', 'comment', 'combien', 'y', 'a', 'l', 'd', 'c', 's',
+    'n', 'j', 'm', 't'
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Version du découpage et de l'indexation, incluse dans le nom de l'index BM25 persisté:
+# à incrémenter à chaque changement de tokenize, chunk_data ou BM25Index (les index existants sont alors ignorés)
+# 1: index d'origine
+INDEX_VERSION = 1
+
+
+def fold_text(text):
+    """Minuscules et suppression des accents"""
+    normalized = unicodedata.normalize('NFKD', str(text).lower())
+    return "".join(c for c in normalized if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """Découpe un texte en termes normalisés (sans accents, sans mots vides, pluriels simples retirés)"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(fold_text(text)):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token[-1] in 'sx':
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def estimate_tokens(text):
+    """Estimation grossière du nombre de tokens d'un texte (~4 caractères par token)"""
+    return len(text) // 4 + 1
+
+
+# ========== DÉCOUPAGE DES DONNÉES EN EXTRAITS ==========
+
+def _split_text(text, max_chars):
+    """Découpe un texte long en fenêtres d'au plus max_chars caractères, sur les espaces"""
+    text = " ".join(text.split())
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield text[:cut]
+        text = text[cut:].lstrip()
+    if text:
+        yield text
+
+
+def _format_scalar(value):
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+def _is_scalar(value):
+    if isinstance(value, list):
+        return all(not isinstance(v, (dict, list)) for v in value)
+    return not isinstance(value, dict)
+
+
+def _json_chunks(node, path, max_chars):
+    """
+    Parcourt un document JSON et produit un extrait par enregistrement:
+    les champs simples d'un objet sont regroupés, les objets et listes imbriqués sont parcourus
+    """
+    if isinstance(node, dict):
+        fields = [f"{key}: {_format_scalar(value)}" for key, value in node.items() if _is_scalar(value)]
+        if fields:
+            for text in _split_text("; ".join(fields), max_chars):
+                yield path, text
+        for key, value in node.items():
+            if not _is_scalar(value):
+                yield from _json_chunks(value, f"{path} > {key}", max_chars)
+    elif isinstance(node, list):
+        if _is_scalar(node):
+            for text in _split_text(_format_scalar(node), max_chars):
+                yield path, text
+        else:
+            for item in node:
+                yield from _json_chunks(item, path, max_chars)
+    else:
+        for text in _split_text(str(node), max_chars):
+            yield path, text
+
+
+def chunk_data(all_data, max_chars=800, max_csv_rows=50000):
+    """
+    Transforme les données chargées (version publiée par DataWatcher) en extraits indexables:
+    une ligne par extrait pour les CSV, un enregistrement pour les JSON, des fenêtres de texte par page pour les PDF
+    Returns: liste de dicts {'source': ..., 'text': ...}
+    """
+    chunks = []
+    for filename, data_info in all_data.items():
+        if data_info['type'] == 'csv':
+            df = data_info['content']
+            columns = [str(c) for c in df.columns]
+            for row in df.head(max_csv_rows).itertuples(index=False):
+                fields = "; ".join(f"{col}: {val}" for col, val in zip(columns, row))
+                chunks.append({'source': filename, 'text': fields})
+
+        elif data_info['type'] == 'pdf':
+            pages = data_info.get('pages') or [data_info['content']]
+            for page_number, page in enumerate(pages, start=1):
+                for text in _split_text(page, max_chars):
+                    chunks.append({'source': f"{filename} p.{page_number}", 'text': text})
+
+        elif data_info['type'] == 'json':
+            for path, text in _json_chunks(data_info['content'], filename, max_chars):
+                chunks.append({'source': path, 'text': text})
+    return chunks
+
+
+# ========== INDEX BM25 ==========
+
+class BM25Index:
+    """
+    Index inversé BM25 en mémoire, sérialisable sur disque.
+    search() ne parcourt que les listes de postings des termes de la requête.
+    """
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+
+        postings = defaultdict(list)
+        self.doc_lengths = []
+        for doc_id, chunk in enumerate(chunks):
+            # La source (nom de fichier, chemin JSON) fait partie du texte indexé
+            counts = Counter(tokenize(chunk['source'] + " " + chunk['text']))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((doc_id, tf))
+        self.postings = dict(postings)
+
+        n_docs = len(chunks)
+        self.avg_length = (sum(self.doc_lengths) / n_docs) if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query, k=8):
+        """Retourne les k meilleurs extraits sous forme de liste (score, extrait)"""
+        scores = defaultdict(float)
+        avg_length = self.avg_length or 1.0
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.chunks[doc_id]) for doc_id, score in best]
+
+    def select(self, query, k=8, token_budget=800):
+        """Meilleurs extraits pour la question, dans la limite du budget de tokens"""
+        selected, used = [], 0
+        for score, chunk in self.search(query, k):
+            cost = estimate_tokens(chunk['text'])
+            if used + cost > token_budget:
+                continue
+            selected.append(chunk)
+            used += cost
+        return selected
+
+    def save(self, path):
+        """Enregistre l'index sur disque"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        """Charge un index enregistré par save()"""
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def format_chunks_for_context(chunks):
+    """Formate les extraits retenus pour le prompt"""
+    if not chunks:
+        return ""
+
+    context = "=== EXTRAITS PERTINENTS POUR LA QUESTION (recherche dans les données) ===\n"
+    for chunk in chunks:
+        context += f"[{chunk['source']}] {chunk['text']}\n"
+    return context + "\n"
+
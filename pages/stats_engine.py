@@ -0,0 +1,287 @@
+"""
+Requêtes statistiques sur les données (débarquements DPM 2019, captures): agrégats précalculés
+et réponses chiffrées exactes injectées dans le prompt à la place des extraits bruts
+Fichier: pages/stats_engine.py
+"""
+
+import re
+
+import pandas as pd
+
+from retrieval import fold_text
+
+MONTHS = ["janvier", "février", "mars", "avril", "mai", "juin",
+          "juillet", "août", "septembre", "octobre", "novembre", "décembre"]
+_MONTH_NUMBERS = {fold_text(month): number for number, month in enumerate(MONTHS, start=1)}
+_MONTH_GROUP = r"(" + "|".join(_MONTH_NUMBERS) + r")"
+_MONTH_PATTERN = re.compile(r"\b" + _MONTH_GROUP + r"\b")
+
+_ORDINALS = r"(premier|1er|1e|1|deuxieme|2e|2eme|second|seconde|2|troisieme|3e|3eme|3|quatrieme|4e|4eme|4|dernier)"
+_ORDINAL_VALUES = {
+    'premier': 1, '1er': 1, '1e': 1, '1': 1,
+    'deuxieme': 2, '2e': 2, '2eme': 2, 'second': 2, 'seconde': 2, '2': 2,
+    'troisieme': 3, '3e': 3, '3eme': 3, '3': 3,
+    'quatrieme': 4, '4e': 4, '4eme': 4, '4': 4,
+}
+_QUARTER_PATTERN = re.compile(r"\b" + _ORDINALS + r"\s+trimestre|\bt([1-4])\b")
+_HALF_PATTERN = re.compile(r"\b" + _ORDINALS + r"\s+semestre|\bs([12])\b")
+# Intervalle seulement si le connecteur est entre les deux mois: "de janvier à mars", "janvier au 31 mars",
+# "entre janvier et mars"; "janvier et mars" reste une liste
+_RANGE_PATTERN = re.compile(
+    r"\bentre\s+" + _MONTH_GROUP + r"\s+et\s+" + _MONTH_GROUP + r"\b"
+    r"|\b" + _MONTH_GROUP + r"\s+(?:a|au|jusqu\W*(?:a|au|en)?)\s+(?:\d{1,2}\s+)?" + _MONTH_GROUP + r"\b"
+)
+_YEAR_PATTERN = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+# Colonnes attendues des sources reconnues
+LANDINGS_KEY = 'artisanale_debarquements_region_mois'
+CAPTURE_COLUMNS = {'date', 'zone', 'espece', 'quantite_kg', 'prix_unitaire_fcfa'}
+
+
+def format_number(value, decimals=0):
+    """Nombre au format français (espace comme séparateur de milliers)"""
+    return f"{value:,.{decimals}f}".replace(",", " ").replace(".", ",")
+
+
+def parse_period(question):
+    """
+    Mois concernés par la question (numéros 1-12): trimestre, semestre, intervalle ou liste de mois
+    Returns: (liste de mois, libellé) ou (None, None) si aucune période n'est citée
+    """
+    text = fold_text(question)
+
+    match = _QUARTER_PATTERN.search(text)
+    if match:
+        quarter = 4 if match.group(1) == 'dernier' else int(match.group(2) or _ORDINAL_VALUES[match.group(1)])
+        return list(range(3 * quarter - 2, 3 * quarter + 1)), f"T{quarter}"
+
+    match = _HALF_PATTERN.search(text)
+    if match:
+        half = 2 if match.group(1) == 'dernier' else int(match.group(2) or _ORDINAL_VALUES[match.group(1)])
+        if half in (1, 2):
+            return list(range(6 * half - 5, 6 * half + 1)), f"S{half}"
+
+    months = [_MONTH_NUMBERS[name] for name in _MONTH_PATTERN.findall(text)]
+    if not months:
+        return None, None
+    for match in _RANGE_PATTERN.finditer(text):
+        first, last = sorted(_MONTH_NUMBERS[name] for name in match.groups() if name)
+        months.extend(range(first, last + 1))
+    months = sorted(set(months))
+    if len(months) > 2 and months == list(range(months[0], months[-1] + 1)):
+        return months, f"{MONTHS[months[0] - 1]} à {MONTHS[months[-1] - 1]}"
+    return months, ", ".join(MONTHS[m - 1] for m in months)
+
+
+def parse_year(question):
+    """Année citée dans la question (la première), None sinon"""
+    match = _YEAR_PATTERN.search(question)
+    return int(match.group(1)) if match else None
+
+
+def _find_sources(all_data):
+    """Repère les sources par leur structure: (fichier, liste des débarquements), (fichier, DataFrame des captures)"""
+    landings, captures = None, None
+    for filename, data_info in all_data.items():
+        content = data_info['content']
+        if data_info['type'] == 'json' and landings is None:
+            if isinstance(content, dict) and isinstance(content.get(LANDINGS_KEY), list):
+                landings = (filename, content[LANDINGS_KEY], content.get('metadata', {}).get('annee'))
+        elif data_info['type'] == 'csv' and captures is None:
+            if CAPTURE_COLUMNS.issubset(content.columns):
+                captures = (filename, content)
+    return landings, captures
+
+
+class StatisticsEngine:
+    """
+    Tables en colonnes et agrégats précalculés au chargement des données:
+    - débarquements artisanaux par région × mois (tonnes),
+    - captures par zone × espèce × mois (kg, valeur en FCFA, dates de la première et de la dernière capture).
+    Les questions sont ensuite résolues par filtrage de ces petites tables, sans repasser sur les lignes.
+    """
+
+    def __init__(self, all_data):
+        self.landings = None          # DataFrame région × mois (1-12), tonnes
+        self.landings_year = None
+        self.landings_source = None
+        self.captures_by_zone_species = None
+        self.captures_source = None
+
+        landings, captures = _find_sources(all_data)
+        if landings is not None:
+            self._load_landings(*landings)
+        if captures is not None:
+            self._load_captures(*captures)
+
+    def _load_landings(self, filename, records, year):
+        df = pd.DataFrame.from_records(records, columns=['region', 'mois', 'tonnes'])
+        df['mois'] = df['mois'].map(lambda name: _MONTH_NUMBERS.get(fold_text(name)))
+        df = df.dropna(subset=['mois'])
+        df = df[~df['region'].map(fold_text).str.startswith('total')]
+        self.landings = df.pivot_table(index='region', columns='mois', values='tonnes', aggfunc='sum', fill_value=0)
+        self.landings_year = year
+        self.landings_source = filename
+
+    def _load_captures(self, filename, df):
+        df = df[['date', 'zone', 'espece', 'quantite_kg', 'prix_unitaire_fcfa']].copy()
+        df['valeur_fcfa'] = df['quantite_kg'] * df['prix_unitaire_fcfa']
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df['annee'] = df['date'].dt.year
+        df['mois'] = df['date'].dt.month
+        # Les lignes sans date valide restent comptées, mais aucune période citée ne les retient
+        grouped = df.groupby(['zone', 'espece', 'annee', 'mois'], observed=True, dropna=False)
+        self.captures_by_zone_species = grouped.agg(
+            quantite_kg=('quantite_kg', 'sum'),
+            valeur_fcfa=('valeur_fcfa', 'sum'),
+            captures=('quantite_kg', 'size'),
+            debut=('date', 'min'),
+            fin=('date', 'max'),
+        ).reset_index()
+        self.captures_by_zone_species['zone'] = self.captures_by_zone_species['zone'].astype(str)
+        self.captures_by_zone_species['espece'] = self.captures_by_zone_species['espece'].astype(str)
+        self.captures_source = filename
+
+    # ---------- Débarquements par région et par mois ----------
+
+    def _regions_for(self, cities, gazetteer):
+        """Régions du rapport correspondant aux lieux cités (un site est rattaché à sa région)"""
+        regions = []
+        known = {fold_text(region): region for region in self.landings.index}
+        for city in cities:
+            region = known.get(fold_text(city))
+            place = gazetteer.get(city) if gazetteer is not None else None
+            if region is None and place is not None and place.region:
+                region = known.get(fold_text(place.region))
+            if region is not None and (city, region) not in regions:
+                regions.append((city, region))
+        return regions
+
+    def landings_context(self, question, analysis, gazetteer=None):
+        months, period_label = parse_period(question)
+        months = months or list(range(1, 13))
+        period_label = period_label or "année complète"
+        year = f" {self.landings_year}" if self.landings_year else ""
+
+        table = self.landings.reindex(columns=months, fill_value=0)
+        totals = table.sum(axis=1)
+
+        context = f"Débarquements de la pêche artisanale{year} par région (tonnes), période: {period_label}\n"
+        # Le rapport ne donne que des totaux régionaux: une région n'est listée qu'une fois, avec les sites cités
+        sites_by_region = {}
+        for city, region in self._regions_for(analysis['cities'], gazetteer):
+            sites = sites_by_region.setdefault(region, [])
+            if fold_text(city) != fold_text(region):
+                sites.append(city)
+        for region, sites in sites_by_region.items():
+            label = f"Région de {region} (total régional"
+            label += f", sites cités: {', '.join(sites)})" if sites else ")"
+            context += f"- {label}: {format_number(totals[region])} t"
+            if len(months) <= 6:
+                detail = ", ".join(f"{MONTHS[m - 1]} {format_number(table.at[region, m])} t" for m in months)
+                context += f" ({detail})"
+            else:
+                monthly = table.loc[region]
+                context += (f" (mois le plus fort: {MONTHS[monthly.idxmax() - 1]} {format_number(monthly.max())} t, "
+                            f"le plus faible: {MONTHS[monthly.idxmin() - 1]} {format_number(monthly.min())} t)")
+            context += "\n"
+
+        national = totals.sum()
+        context += f"- Total des {len(totals)} régions: {format_number(national)} t\n"
+        cited_sites = [site for sites in sites_by_region.values() for site in sites]
+        if cited_sites:
+            context += (f"Aucun chiffre par site de débarquement dans le rapport: le total d'une région n'est pas "
+                        f"celui de {', '.join(cited_sites)}, ne l'attribue pas à un site.\n")
+        if analysis['needs_comparison'] or not sites_by_region:
+            ranking = totals.sort_values(ascending=False)
+            context += "Classement des régions: " + ", ".join(
+                f"{rank}. {region} {format_number(value)} t ({format_number(100 * value / national, 1)} %)"
+                for rank, (region, value) in enumerate(ranking.items(), start=1)
+            ) + "\n"
+        return context
+
+    # ---------- Captures par zone et espèce ----------
+
+    def _matching_values(self, values, question, cities):
+        """Valeurs d'une colonne (zones, espèces) citées dans la question ou correspondant aux lieux cités"""
+        text = f" {' '.join(re.findall(r'[a-z0-9]+', fold_text(question)))} "
+        folded_cities = [fold_text(city) for city in cities]
+        matched = []
+        for value in values:
+            folded = fold_text(value)
+            if f" {folded} " in text or f" {folded}s " in text or any(city.startswith(folded) for city in folded_cities):
+                matched.append(value)
+        return matched
+
+    def captures_context(self, question, analysis):
+        """Captures pour la période citée (chaîne vide si la période citée n'est pas couverte par les données)"""
+        table = self.captures_by_zone_species
+        months, _ = parse_period(question)
+        year = parse_year(question)
+        if months:
+            table = table[table['mois'].isin(months)]
+        if year:
+            table = table[table['annee'] == year]
+        if table.empty:
+            return ""
+
+        zones = self._matching_values(sorted(table['zone'].unique()), question, analysis['cities'])
+        species = self._matching_values(sorted(table['espece'].unique()), question, [])
+
+        selected = table
+        if zones:
+            selected = selected[selected['zone'].isin(zones)]
+        if species:
+            selected = selected[selected['espece'].isin(species)]
+        first, last = table['debut'].min(), table['fin'].max()
+        period = f", du {first:%d/%m/%Y} au {last:%d/%m/%Y}" if pd.notna(first) else ""
+        scope = f" - zones: {', '.join(zones)}" if zones else ""
+        scope += f" - espèces: {', '.join(species)}" if species else ""
+        context = f"Captures enregistrées{period}{scope}\n"
+        if selected.empty:
+            return context + "- Aucune capture enregistrée pour ces critères\n"
+
+        by_species = selected.groupby('espece').agg(
+            quantite_kg=('quantite_kg', 'sum'), valeur_fcfa=('valeur_fcfa', 'sum'), captures=('captures', 'sum')
+        ).sort_values('quantite_kg', ascending=False)
+        for espece, row in by_species.iterrows():
+            context += (f"- {espece}: {format_number(row['quantite_kg'])} kg, {format_number(row['valeur_fcfa'])} FCFA, "
+                        f"prix moyen {format_number(row['valeur_fcfa'] / row['quantite_kg'])} FCFA/kg "
+                        f"({int(row['captures'])} capture{'s' if row['captures'] > 1 else ''})\n")
+
+        if analysis['needs_comparison'] or not zones:
+            by_zone = selected.groupby('zone')[['quantite_kg', 'valeur_fcfa']].sum().sort_values(
+                'quantite_kg', ascending=False)
+            context += "Par zone: " + ", ".join(
+                f"{zone} {format_number(row['quantite_kg'])} kg / {format_number(row['valeur_fcfa'])} FCFA"
+                for zone, row in by_zone.iterrows()
+            ) + "\n"
+
+        total_kg, total_value = selected['quantite_kg'].sum(), selected['valeur_fcfa'].sum()
+        context += f"- Total: {format_number(total_kg)} kg, {format_number(total_value)} FCFA\n"
+        return context
+
+    def answer(self, question, analysis, gazetteer=None):
+        """
+        Statistiques calculées pour la question (chaîne vide si aucune n'est pertinente)
+        Returns: (contexte, fichiers sources utilisés)
+        """
+        if not (analysis['needs_statistics'] or analysis['needs_species'] or analysis['needs_comparison']):
+            return "", set()
+
+        parts, used = [], set()
+        if self.landings is not None and analysis['needs_statistics']:
+            parts.append(self.landings_context(question, analysis, gazetteer))
+            used.add(self.landings_source)
+        if self.captures_by_zone_species is not None:
+            captures = self.captures_context(question, analysis)
+            if captures:
+                parts.append(captures)
+                used.add(self.captures_source)
+        if not parts:
+            return "", set()
+
+        context = "\n=== STATISTIQUES CALCULÉES (valeurs exactes issues des fichiers de données) ===\n"
+        context += "\n".join(parts)
+        context += "Utilise ces chiffres tels quels, ne les recalcule pas.\n\n"
+        return context, used
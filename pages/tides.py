@@ -0,0 +1,197 @@
+"""
+Prédiction des marées par constantes harmoniques (calcul vectorisé NumPy, cache par station et par jour)
+Fichier: pages/tides.py
+"""
+
+import math
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+
+TideStation = namedtuple('TideStation', ['name', 'lat', 'lon', 'z0', 'constituents'])
+
+# Composantes harmoniques: vitesse de l'argument astronomique donnée par les nombres de Doodson
+# (coefficients de T = angle horaire du soleil moyen, s, h, p) et déphasage constant en degrés
+CONSTITUENTS = {
+    'M2': (2, -2, 2, 0, 0),
+    'S2': (2, 0, 0, 0, 0),
+    'N2': (2, -3, 2, 1, 0),
+    'K2': (2, 0, 2, 0, 0),
+    'K1': (1, 0, 1, 0, -90),
+    'O1': (1, -2, 1, 0, 90),
+    'P1': (1, 0, -1, 0, 90),
+    'Q1': (1, -3, 1, 1, 90),
+}
+CONSTITUENT_NAMES = list(CONSTITUENTS)
+_DOODSON = np.array([CONSTITUENTS[name][:4] for name in CONSTITUENT_NAMES], dtype=float)
+_PHASE_OFFSET = np.array([CONSTITUENTS[name][4] for name in CONSTITUENT_NAMES], dtype=float)
+
+# Longitudes moyennes (degrés) à J2000 et vitesses (degrés par siècle julien)
+_J2000 = datetime(2000, 1, 1, 12, 0)
+_HOURS_PER_CENTURY = 36525 * 24
+_S0, _S_RATE = 218.3164, 481267.8812    # lune
+_H0, _H_RATE = 280.4661, 36000.7698     # soleil
+_P0, _P_RATE = 83.3535, 4069.0137       # périgée lunaire
+_N0, _N_RATE = 125.0445, -1934.1363     # nœud ascendant lunaire
+
+# Vitesses angulaires (degrés par heure) des composantes
+SPEEDS = _DOODSON @ np.array([15.0, _S_RATE / _HOURS_PER_CENTURY, _H_RATE / _HOURS_PER_CENTURY,
+                              _P_RATE / _HOURS_PER_CENTURY])
+
+# Constantes harmoniques (amplitude en m, situation g en degrés, UTC) et niveau moyen z0 (m au-dessus du zéro
+# des cartes). Valeurs approchées pour la côte sénégalaise, à remplacer par les constantes officielles
+# (SHOM/ANAM) quand elles sont disponibles. Le Sénégal est à UTC+0 toute l'année: heures UTC = heures locales.
+TIDE_STATIONS = {
+    'Dakar': TideStation('Dakar', 14.6928, -17.4467, 1.00, {
+        'M2': (0.50, 205), 'S2': (0.17, 235), 'N2': (0.10, 185), 'K2': (0.05, 232),
+        'K1': (0.06, 350), 'O1': (0.02, 300), 'P1': (0.02, 345), 'Q1': (0.005, 290)}),
+    'Saint-Louis': TideStation('Saint-Louis', 16.0179, -16.4896, 0.95, {
+        'M2': (0.45, 214), 'S2': (0.15, 245), 'N2': (0.09, 194), 'K2': (0.04, 242),
+        'K1': (0.06, 352), 'O1': (0.02, 302), 'P1': (0.02, 347), 'Q1': (0.005, 292)}),
+    'Kayar': TideStation('Kayar', 14.9186, -17.1206, 1.00, {
+        'M2': (0.49, 208), 'S2': (0.17, 238), 'N2': (0.10, 188), 'K2': (0.05, 235),
+        'K1': (0.06, 350), 'O1': (0.02, 300), 'P1': (0.02, 345), 'Q1': (0.005, 290)}),
+    'Mbour': TideStation('Mbour', 14.4199, -16.9640, 1.05, {
+        'M2': (0.55, 210), 'S2': (0.19, 241), 'N2': (0.11, 190), 'K2': (0.05, 238),
+        'K1': (0.06, 352), 'O1': (0.02, 302), 'P1': (0.02, 347), 'Q1': (0.005, 292)}),
+    'Joal-Fadiouth': TideStation('Joal-Fadiouth', 14.1667, -16.8333, 1.08, {
+        'M2': (0.57, 213), 'S2': (0.20, 244), 'N2': (0.11, 193), 'K2': (0.05, 241),
+        'K1': (0.06, 353), 'O1': (0.02, 303), 'P1': (0.02, 348), 'Q1': (0.005, 293)}),
+    'Kaolack': TideStation('Kaolack', 14.1520, -16.0726, 1.15, {
+        'M2': (0.65, 265), 'S2': (0.22, 297), 'N2': (0.13, 245), 'K2': (0.06, 294),
+        'K1': (0.07, 10), 'O1': (0.02, 320), 'P1': (0.02, 5), 'Q1': (0.005, 310)}),
+}
+
+
+def _hours_since_j2000(moment):
+    return (moment - _J2000).total_seconds() / 3600.0
+
+
+def _nodal_corrections(hours):
+    """Facteurs nodaux f et corrections u (degrés) au temps donné (varient sur 18,6 ans)"""
+    n = math.radians(_N0 + _N_RATE * hours / _HOURS_PER_CENTURY)
+    cos_n, sin_n = math.cos(n), math.sin(n)
+    m2 = (1.0 - 0.037 * cos_n, -2.1 * sin_n)
+    k1 = (1.006 + 0.115 * cos_n, -8.9 * sin_n)
+    o1 = (1.009 + 0.187 * cos_n, 10.8 * sin_n)
+    k2 = (1.024 + 0.286 * cos_n, -17.7 * sin_n)
+    table = {'M2': m2, 'N2': m2, 'S2': (1.0, 0.0), 'K2': k2, 'K1': k1, 'O1': o1, 'Q1': o1, 'P1': (1.0, 0.0)}
+    f = np.array([table[name][0] for name in CONSTITUENT_NAMES])
+    u = np.array([table[name][1] for name in CONSTITUENT_NAMES])
+    return f, u
+
+
+def _equilibrium_arguments(hours):
+    """Arguments astronomiques V0 (degrés) des composantes au temps donné"""
+    centuries = hours / _HOURS_PER_CENTURY
+    angles = np.array([
+        15.0 * hours,  # angle horaire du soleil moyen (vaut 0 mod 360 à J2000, 12h UTC)
+        _S0 + _S_RATE * centuries,
+        _H0 + _H_RATE * centuries,
+        _P0 + _P_RATE * centuries,
+    ])
+    return _DOODSON @ angles + _PHASE_OFFSET
+
+
+def predict_heights(station, start, step_minutes, count):
+    """
+    Hauteurs d'eau (m) de `count` instants espacés de `step_minutes` à partir de `start` (UTC)
+    Les arguments astronomiques sont linéaires dans le temps: une seule évaluation trigonométrique par instant
+    et par composante, sans boucle Python.
+    """
+    start_hours = _hours_since_j2000(start)
+    elapsed = np.arange(count) * (step_minutes / 60.0)
+    f, u = _nodal_corrections(start_hours + elapsed[-1] / 2 if count else start_hours)
+
+    amplitudes = np.array([station.constituents.get(name, (0.0, 0.0))[0] for name in CONSTITUENT_NAMES])
+    phases = np.array([station.constituents.get(name, (0.0, 0.0))[1] for name in CONSTITUENT_NAMES])
+    v0 = _equilibrium_arguments(start_hours) + u - phases
+
+    arguments = np.radians(v0[:, None] + SPEEDS[:, None] * elapsed[None, :])
+    return station.z0 + (amplitudes * f) @ np.cos(arguments)
+
+
+def find_extrema(heights, start, step_minutes):
+    """
+    Pleines et basses mers d'une série de hauteurs, affinées par interpolation parabolique
+    Returns: liste de (datetime, hauteur, 'haute' | 'basse')
+    """
+    diff = np.diff(heights)
+    rising = diff > 0
+    turning = np.nonzero(rising[:-1] != rising[1:])[0] + 1
+    if turning.size == 0:
+        return []
+
+    y0, y1, y2 = heights[turning - 1], heights[turning], heights[turning + 1]
+    curvature = y0 - 2 * y1 + y2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(curvature != 0, 0.5 * (y0 - y2) / curvature, 0.0)
+    extreme_heights = y1 - 0.25 * (y0 - y2) * offset
+    minutes = (turning + offset) * step_minutes
+
+    return [
+        (start + timedelta(minutes=float(minute)), float(height), 'haute' if is_high else 'basse')
+        for minute, height, is_high in zip(minutes, extreme_heights, rising[turning - 1])
+    ]
+
+
+class TideEngine:
+    """
+    Horaires et hauteurs des marées par station, calculés à la demande et mémorisés par (station, jour).
+    Les jours manquants d'une demande sont calculés en un seul bloc vectorisé.
+    """
+
+    def __init__(self, stations=None, step_minutes=6):
+        self.stations = stations or TIDE_STATIONS
+        self.step_minutes = step_minutes
+        self._days = {}  # (station, date) -> liste d'extrêmes
+        self._lock = threading.Lock()
+
+    def nearest_station(self, lat, lon):
+        """Station la plus proche de coordonnées (distance approximative, suffisante à cette échelle)"""
+        def distance(station):
+            return (station.lat - lat) ** 2 + ((station.lon - lon) * math.cos(math.radians(lat))) ** 2
+        return min(self.stations.values(), key=distance).name
+
+    def extrema(self, station_name, first_day, days=1):
+        """
+        Extrêmes de marée d'une station, jour par jour
+        Returns: dict {date: [(datetime, hauteur, type), ...]}
+        """
+        wanted = [first_day + timedelta(days=i) for i in range(days)]
+        with self._lock:
+            missing = [day for day in wanted if (station_name, day) not in self._days]
+            if missing:
+                self._compute(station_name, min(missing), max(missing))
+            return {day: self._days[(station_name, day)] for day in wanted}
+
+    def precompute(self, first_day, days):
+        """Calcule d'avance les extrêmes de toutes les stations sur une période"""
+        for name in self.stations:
+            self.extrema(name, first_day, days)
+
+    def _compute(self, station_name, first_day, last_day):
+        station = self.stations[station_name]
+        # Une heure de marge de chaque côté pour ne pas manquer un extrême proche de minuit
+        start = datetime.combine(first_day, datetime.min.time()) - timedelta(hours=1)
+        total_minutes = ((last_day - first_day).days + 1) * 24 * 60 + 120
+        count = total_minutes // self.step_minutes + 1
+
+        heights = predict_heights(station, start, self.step_minutes, count)
+        by_day = {first_day + timedelta(days=i): [] for i in range((last_day - first_day).days + 1)}
+        for moment, height, kind in find_extrema(heights, start, self.step_minutes):
+            if moment.date() in by_day:
+                by_day[moment.date()].append((moment, height, kind))
+        for day, extremes in by_day.items():
+            self._days[(station_name, day)] = extremes
+
+
+def format_tides(extremes):
+    """Extrêmes d'une journée au format [{'type', 'time', 'height'}]"""
+    return [
+        {'type': kind, 'time': moment.strftime('%H:%M'), 'height': f"{height:.1f}m"}
+        for moment, height, kind in extremes
+    ]
+
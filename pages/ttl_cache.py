@@ -0,0 +1,122 @@
+"""
+Cache mémoire à durée de vie limitée (TTL), partagé par toutes les sessions du processus
+Fichier: pages/ttl_cache.py
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Cache clé/valeur thread-safe avec expiration et éviction LRU.
+
+    - Une entrée est "fraîche" pendant `ttl` secondes : elle est servie directement.
+    - Elle reste "périmée mais utilisable" pendant `stale_ttl` secondes de plus : elle est
+      servie immédiatement et rechargée en arrière-plan (stale-while-revalidate).
+    - Au-delà, ou en l'absence d'entrée, le chargement est fait de façon synchrone.
+    - `maxsize` borne le nombre d'entrées (les moins récemment utilisées sont évincées).
+    """
+
+    def __init__(self, ttl, stale_ttl=0, maxsize=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # clé -> (valeur, stocké_le)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def get(self, key, default=None):
+        """Retourne la valeur fraîche associée à la clé, sinon `default`"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+            return default
+
+    def set(self, key, value):
+        """Stocke une valeur dans le cache"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+    def peek(self, key):
+        """
+        Valeur que get_or_load servirait sans chargement (fraîche, ou périmée mais utilisable), sinon None.
+        Ne compte ni succès ni échec et ne déclenche pas de rechargement.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl + self.stale_ttl:
+                return entry[0]
+            return None
+
+    def get_or_load(self, key, loader):
+        """
+        Retourne la valeur en cache ou appelle `loader()` pour la charger.
+        Les exceptions de `loader` sont propagées lors d'un chargement synchrone ;
+        les valeurs None ne sont pas mises en cache.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[1]
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[0]
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._stats['stale_hits'] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                    return entry[0]
+            self._stats['misses'] += 1
+
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+            with self._lock:
+                self._stats['refreshes'] += 1
+        except Exception:
+            # On garde la valeur périmée, elle sera rechargée à la prochaine demande
+            with self._lock:
+                self._stats['refresh_errors'] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, key):
+        """Supprime une entrée du cache"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Vide le cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Compteurs de succès/échecs et taille actuelle du cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
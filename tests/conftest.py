@@ -0,0 +1,41 @@
+"""
+Base PostgreSQL de test: schéma temporaire dans la base des variables DB_*, supprimé à la fin du module.
+PGOPTIONS place toutes les connexions (y compris celles de la file d'écriture) dans ce schéma.
+Les tests qui l'utilisent sont ignorés si psycopg2 manque ou si PostgreSQL est injoignable.
+Fichier: tests/conftest.py
+"""
+
+import itertools
+import os
+
+import pytest
+
+_schemas = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def history_db():
+    psycopg2 = pytest.importorskip("psycopg2")
+    from database import ChatHistoryDB, get_connection_params
+
+    schema = f"test_{os.getpid()}_{next(_schemas)}"
+    try:
+        admin = psycopg2.connect(**get_connection_params())
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL indisponible: {e}")
+    admin.autocommit = True
+    admin.cursor().execute(f"CREATE SCHEMA {schema}")
+
+    previous_options = os.environ.get('PGOPTIONS')
+    os.environ['PGOPTIONS'] = f"-c search_path={schema}"
+    try:
+        db = ChatHistoryDB(use_pool=False, write_behind=False, partitioned=False)
+        assert db.init_database()
+        yield db
+    finally:
+        if previous_options is None:
+            os.environ.pop('PGOPTIONS', None)
+        else:
+            os.environ['PGOPTIONS'] = previous_options
+        admin.cursor().execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
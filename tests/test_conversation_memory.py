@@ -0,0 +1,84 @@
+"""
+Mémoire de conversation: lots résumés par échanges complets, résumé calculé en arrière-plan
+Fichier: tests/test_conversation_memory.py
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from conversation_memory import ConversationMemory
+
+
+def conversation(turns, question=True):
+    messages = [{'role': 'assistant', 'content': 'Bienvenue', 'static': True}]
+    for i in range(turns):
+        messages += [{'role': 'user', 'content': f"q{i}"}, {'role': 'assistant', 'content': f"r{i}"}]
+    if question:
+        messages.append({'role': 'user', 'content': f"q{turns}"})
+    return messages
+
+
+class ManualExecutor:
+    """Exécuteur dont les tâches ne se terminent que sur demande"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.calls.append((future, fn, args))
+        return future
+
+    def finish(self):
+        for future, fn, args in self.calls:
+            future.set_result(fn(*args))
+
+
+def test_folds_whole_turns_only():
+    memory = ConversationMemory(keep_turns=2, fold_turns=2)
+    assert memory.pending(conversation(3)) == []
+    to_fold = memory.pending(conversation(4))
+    assert [m['content'] for m in to_fold] == ['q0', 'r0', 'q1', 'r1']
+    # La question en cours n'entre jamais dans un lot, même sans fenêtre
+    memory = ConversationMemory(keep_turns=0, fold_turns=1)
+    assert [m['content'] for m in memory.pending(conversation(1))] == ['q0', 'r0']
+
+
+def test_summary_runs_in_background_and_late_result_is_kept():
+    memory = ConversationMemory(keep_turns=1, fold_turns=1)
+    executor = ManualExecutor()
+    summarize = lambda previous, messages: previous + "".join(m['content'] for m in messages)
+
+    memory.fold_in_background(conversation(2), executor, summarize)
+    assert len(executor.calls) == 1
+    # Résumé pas encore terminé: la fenêtre envoie encore tout, aucun second appel n'est lancé
+    summary, history = memory.window(conversation(2))
+    assert summary == "" and len(history) == 5
+    memory.fold_in_background(conversation(3), executor, summarize)
+    assert len(executor.calls) == 1
+
+    executor.finish()
+    memory.fold_in_background(conversation(3), executor, summarize)
+    summary, history = memory.window(conversation(3))
+    assert summary == "q0r0"
+    assert [m['content'] for m in history] == ['q1', 'r1', 'q2', 'r2', 'q3']
+    assert len(executor.calls) == 2
+
+
+def test_failed_summary_keeps_messages():
+    memory = ConversationMemory(keep_turns=1, fold_turns=1)
+    with ThreadPoolExecutor(1) as executor:
+        memory.fold_in_background(conversation(2), executor, lambda previous, messages: None)
+    memory.collect()
+    assert memory.window(conversation(2)) == ("", [
+        {'role': m['role'], 'content': m['content']} for m in conversation(2)[1:]])
+
+
+def test_reset_conversation_drops_pending_summary():
+    memory = ConversationMemory(keep_turns=1, fold_turns=1)
+    executor = ManualExecutor()
+    memory.fold_in_background(conversation(2), executor, lambda previous, messages: "ancien")
+    memory.fold(2, "résumé")
+    memory.pending(conversation(0))
+    executor.finish()
+    memory.collect()
+    assert memory.summary == "" and memory.folded == 0
@@ -0,0 +1,42 @@
+"""
+Chargement des fichiers de données: résultat identique en séquentiel et dans le pool de processus,
+erreurs reportées fichier par fichier
+Fichier: tests/test_data_loader.py
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from data_loader import load_data_files
+
+
+@pytest.fixture
+def data_files(tmp_path):
+    (tmp_path / "captures.csv").write_text("date,zone,espece\n2024-11-01,Dakar,thiof\n", encoding='utf-8')
+    for i in range(3):
+        (tmp_path / f"releve_{i}.json").write_text(json.dumps({'releve': i}), encoding='utf-8')
+    (tmp_path / "casse.json").write_text("{", encoding='utf-8')
+    return sorted(str(path) for path in tmp_path.iterdir())
+
+
+def test_pool_matches_sequential(data_files):
+    sequential, sequential_errors = load_data_files(data_files)
+    # min_bytes=0: tous les fichiers passent par le pool
+    pooled, pooled_errors = load_data_files(data_files, workers=2, timeout=60, min_bytes=0)
+    assert list(pooled) == list(sequential)
+    assert sorted(pooled_errors) == sorted(sequential_errors) == [p for p in data_files if p.endswith("casse.json")]
+    for path, data_info in sequential.items():
+        if data_info['type'] == 'json':
+            assert pooled[path] == data_info
+        else:
+            assert pooled[path]['content'].equals(data_info['content'])
+
+
+def test_progress_reports_every_file(data_files):
+    seen = []
+    load_data_files(data_files, workers=2, timeout=60, min_bytes=0,
+                    progress=lambda done, total, path: seen.append((done, total)))
+    assert seen == [(i, len(data_files)) for i in range(1, len(data_files) + 1)]
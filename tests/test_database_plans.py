@@ -0,0 +1,94 @@
+"""
+Plans d'exécution des requêtes d'historique sur une base PostgreSQL remplie (EXPLAIN):
+chaque page est lue par son index composite, sans tri.
+Utilise le schéma temporaire de tests/conftest.py; ignoré si PostgreSQL est injoignable.
+Fichier: tests/test_database_plans.py
+"""
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from database import SESSION_HISTORY_SQL, USER_HISTORY_SQL
+from db_common import (
+    SESSION_HISTORY_FIRST_SQL, SESSION_HISTORY_NEXT_SQL, USER_HISTORY_FIRST_SQL, USER_HISTORY_NEXT_SQL,
+)
+
+USERS = 200
+SESSIONS = 2000
+MESSAGES = 100000
+
+
+@pytest.fixture(scope="module")
+def db(history_db):
+    with history_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO chat_sessions (user_identifiant, started_at, last_activity)
+            SELECT 'u' || (i %% %s), TIMESTAMP '2024-01-01', TIMESTAMP '2024-01-01'
+            FROM generate_series(1, %s) AS i
+        """, (USERS, SESSIONS))
+        cursor.execute("""
+            INSERT INTO chat_messages (session_id, user_identifiant, role, content, created_at)
+            SELECT s, 'u' || (s %% %s), 'user', repeat('x', 50), TIMESTAMP '2024-01-01' + i * INTERVAL '1 second'
+            FROM generate_series(1, %s) AS i, LATERAL (SELECT 1 + (i * 7919) %% %s AS s) AS pick
+        """, (USERS, MESSAGES, SESSIONS))
+        cursor.execute("ANALYZE chat_sessions")
+        cursor.execute("ANALYZE chat_messages")
+        conn.commit()
+    return history_db
+
+
+def explain(db, query, params):
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("EXPLAIN " + query, params)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        conn.rollback()
+    return plan
+
+
+def page_cursor(db, **filters):
+    """(created_at, id) au milieu de l'historique filtré, pour tester les pages suivantes"""
+    history = db.get_user_history(limit=40, **filters)
+    return db.history_cursor(history[:20])
+
+
+@pytest.mark.parametrize("next_page", [False, True], ids=["premiere page", "page suivante"])
+def test_user_history_uses_user_index(db, next_page):
+    created_at, message_id = page_cursor(db, user_identifiant='u7') if next_page else (None, None)
+    plan = explain(db, USER_HISTORY_SQL, ('u7', created_at, created_at, message_id, 20))
+    assert "idx_messages_user_created" in plan, plan
+    assert "Index Scan" in plan, plan
+    assert "Sort" not in plan, plan
+
+
+@pytest.mark.parametrize("next_page", [False, True], ids=["premiere page", "page suivante"])
+def test_session_history_uses_session_index(db, next_page):
+    created_at, message_id = page_cursor(db, user_identifiant='u8', session_id=8) if next_page else (None, None)
+    plan = explain(db, SESSION_HISTORY_SQL, (8, created_at, created_at, message_id, 20))
+    assert "idx_messages_session_created" in plan, plan
+    assert "Index Scan" in plan, plan
+    assert "Sort" not in plan, plan
+
+
+@pytest.mark.parametrize("next_page", [False, True], ids=["premiere page", "page suivante"])
+def test_psycopg3_variants_use_the_same_indexes(db, next_page):
+    """Requêtes sans `%s IS NULL` d'async_database.py (liaison des paramètres côté serveur)"""
+    user_keyset = page_cursor(db, user_identifiant='u7') if next_page else ()
+    session_keyset = page_cursor(db, user_identifiant='u8', session_id=8) if next_page else ()
+    user_sql = USER_HISTORY_NEXT_SQL if next_page else USER_HISTORY_FIRST_SQL
+    session_sql = SESSION_HISTORY_NEXT_SQL if next_page else SESSION_HISTORY_FIRST_SQL
+    for query, params, index in ((user_sql, ('u7', *user_keyset, 20), "idx_messages_user_created"),
+                                 (session_sql, (8, *session_keyset, 20), "idx_messages_session_created")):
+        plan = explain(db, query, params)
+        assert index in plan, plan
+        assert "Sort" not in plan, plan
+
+
+def test_pages_follow_each_other(db):
+    first = db.get_user_history('u7', limit=20)
+    second = db.get_user_history('u7', limit=20, cursor=db.history_cursor(first))
+    keys = [(m['created_at'], m['id']) for m in first + second]
+    assert len(keys) == 40
+    assert keys == sorted(keys, reverse=True)
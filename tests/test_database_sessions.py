@@ -0,0 +1,108 @@
+"""
+Résolution de la session active (get_or_create_chat_session) et ordre des messages
+entre la file d'écriture différée et save_turn
+Utilise le schéma temporaire de tests/conftest.py; ignoré si PostgreSQL est injoignable.
+Fichier: tests/test_database_sessions.py
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from database import ChatHistoryDB, MessageWriteQueue
+
+
+def resolve_session(db, user_identifiant, session_id=None):
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT get_or_create_chat_session(%s, %s)", (user_identifiant, session_id))
+        resolved = cursor.fetchone()[0]
+        conn.commit()
+    return resolved
+
+
+def expire(db, session_id):
+    with db.connection() as conn:
+        conn.cursor().execute(
+            "UPDATE chat_sessions SET last_activity = NOW() - INTERVAL '2 days' WHERE id = %s", (session_id,))
+        conn.commit()
+
+
+def test_known_active_session_is_kept(history_db):
+    known = history_db.create_session('keep')
+    history_db.create_session('keep')  # plus récente
+    assert resolve_session(history_db, 'keep', known) == known
+
+
+def test_closed_session_falls_back_to_latest_active(history_db):
+    active = history_db.create_session('closed')
+    closed = history_db.create_session('closed')
+    history_db.close_session(closed)
+    assert resolve_session(history_db, 'closed', closed) == active
+
+
+def test_expired_session_falls_back_to_latest_active(history_db):
+    active = history_db.create_session('expired')
+    stale = history_db.create_session('expired')
+    expire(history_db, stale)
+    assert resolve_session(history_db, 'expired', stale) == active
+
+
+def test_session_of_another_user_is_not_reused(history_db):
+    other = history_db.create_session('other')
+    resolved = resolve_session(history_db, 'me', other)
+    assert resolved != other
+    assert resolve_session(history_db, 'me') == resolved
+
+
+def test_new_session_without_active_one(history_db):
+    stale = history_db.create_session('none')
+    expire(history_db, stale)
+    resolved = resolve_session(history_db, 'none', stale)
+    assert resolved not in (stale, None)
+    assert resolve_session(history_db, 'none') == resolved
+
+
+class SlowWrites:
+    """Base dont les écritures par lot sont lentes: le message reste en cours d'écriture dans la file"""
+
+    def __init__(self, db, delay):
+        self.db = db
+        self.delay = delay
+
+    def insert_messages(self, rows):
+        time.sleep(self.delay)
+        return self.db.insert_messages(rows)
+
+
+def test_save_turn_after_queued_messages(history_db):
+    db = ChatHistoryDB(use_pool=False, write_behind=False, partitioned=False)
+    db.write_queue = MessageWriteQueue(SlowWrites(history_db, 0.3), flush_interval=0.05)
+    try:
+        session_id = db.create_session('queued')
+        assert db.save_message(session_id, 'queued', 'user', 'en file')
+        assert db.save_turn('queued', [{'role': 'user', 'content': 'question'},
+                                       {'role': 'assistant', 'content': 'réponse'}], session_id) == session_id
+        history = db.get_user_history('queued', session_id=session_id)
+        assert [m['content'] for m in history] == ['en file', 'question', 'réponse']
+    finally:
+        db.write_queue.close()
+
+
+def test_response_cache_check_runs_no_ddl(history_db):
+    assert history_db.has_response_cache()
+    with history_db.connection() as conn:
+        conn.cursor().execute("ALTER TABLE response_cache RENAME TO response_cache_moved")
+        conn.commit()
+    try:
+        assert not history_db.has_response_cache()
+        with history_db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT to_regclass('response_cache')")
+            assert cursor.fetchone()[0] is None
+    finally:
+        with history_db.connection() as conn:
+            conn.cursor().execute("ALTER TABLE response_cache_moved RENAME TO response_cache")
+            conn.commit()
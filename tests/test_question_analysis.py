@@ -0,0 +1,43 @@
+"""
+Tests de l'analyse des questions sur un jeu de questions annotées (tests/fixtures/questions.json):
+besoins détectés et villes citées, dans l'ordre
+Fichier: tests/test_question_analysis.py
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from question_analysis import CITY_ALIASES, KeywordMatcher, analyze_question_type, build_question_matcher
+
+NEEDS = ['needs_weather', 'needs_tide', 'needs_statistics', 'needs_species',
+         'needs_regulations', 'needs_platform_info', 'needs_comparison']
+LABELLED_QUESTIONS = json.loads((Path(__file__).parent / 'fixtures' / 'questions.json').read_text(encoding='utf-8'))
+
+
+@pytest.mark.parametrize("case", LABELLED_QUESTIONS, ids=[case['question'] for case in LABELLED_QUESTIONS])
+def test_labelled_question(case):
+    analysis = analyze_question_type(case['question'])
+    assert {need for need in NEEDS if analysis[need]} == set(case['needs'])
+    assert analysis['cities'] == case['cities']
+    assert analysis['city'] == (case['cities'][0] if case['cities'] else "Dakar")
+
+
+def test_gazetteer_places_in_same_pass():
+    matcher = build_question_matcher({**CITY_ALIASES, 'Hann': ['hann'], 'Soumbédioune': ['soumbedioune']})
+    analysis = analyze_question_type("Météo à Soumbédioune et Hann", matcher)
+    assert analysis['cities'] == ['Soumbédioune', 'Hann']
+    assert analysis['needs_weather']
+
+
+def test_whole_words_only():
+    matcher = KeywordMatcher({'tide': ['maree'], 'fishing': ['peche*']})
+    assert matcher.find("Marées et pêcheurs") == ['tide', 'fishing']
+    assert matcher.find("Mareyeurs et dépêche") == []
+
+
+def test_word_cache_is_bounded():
+    matcher = KeywordMatcher({'tide': ['maree']}, max_cached_words=3)
+    matcher.find("un deux trois quatre cinq")
+    assert len(matcher._cache) <= 3
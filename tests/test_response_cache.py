@@ -0,0 +1,51 @@
+"""
+Clé du cache de réponses: questions équivalentes, historique de la conversation, données météo utilisées
+Fichier: tests/test_response_cache.py
+"""
+
+import time
+
+from question_analysis import analyze_question_type
+from response_cache import normalize_question, response_cache_key
+from ttl_cache import TTLCache
+
+WEATHER = [{'dt': 1, 'main': {'temp': 26}}, {'list': [{'dt': 2}]}]
+
+
+def key(question, history=(), weather=WEATHER, day='2026-10-17'):
+    return response_cache_key(question, analyze_question_type(question), 'donnees-v1', day, weather, history)
+
+
+def test_equivalent_questions_share_a_key():
+    assert key("Météo à Dakar demain ?") == key("meteo a  DAKAR demain")
+
+
+def test_negation_and_order_are_kept():
+    assert normalize_question("Ne pas pêcher à Mbour ?") == "ne pas pecher a mbour"
+    assert key("Peut-on pêcher à Mbour ?") != key("Peut-on ne pas pêcher à Mbour ?")
+
+
+def test_follow_up_depends_on_the_conversation():
+    dakar = [{'role': 'user', 'content': "Météo à Dakar demain ?"}, {'role': 'assistant', 'content': "26 °C"}]
+    mbour = [{'role': 'user', 'content': "Prix du thiof à Mbour"}, {'role': 'assistant', 'content': "3 500 FCFA"}]
+    assert key("Et pour après-demain ?", dakar) != key("Et pour après-demain ?", mbour)
+    assert key("Et pour après-demain ?", dakar) == key("Et pour après-demain ?", list(dakar))
+
+
+def test_key_follows_weather_data_and_day():
+    updated = [{'dt': 3, 'main': {'temp': 28}}, WEATHER[1]]
+    assert key("Météo à Dakar demain ?") != key("Météo à Dakar demain ?", weather=updated)
+    assert key("Météo à Dakar demain ?") != key("Météo à Dakar demain ?", day='2026-10-18')
+
+
+def test_peek_serves_stale_values_without_loading():
+    cache = TTLCache(ttl=0.05, stale_ttl=10)
+    assert cache.peek('k') is None
+    cache.set('k', 'v')
+    time.sleep(0.06)
+    assert cache.peek('k') == 'v'
+    assert cache.stats()['misses'] == 0
+    expired = TTLCache(ttl=0.01)
+    expired.set('k', 'v')
+    time.sleep(0.02)
+    assert expired.peek('k') is None
@@ -0,0 +1,101 @@
+"""
+Tests de l'analyse des périodes citées dans les questions statistiques et des contextes calculés
+Fichier: tests/test_stats_engine.py
+"""
+
+import pandas as pd
+import pytest
+
+from gazetteer import Place
+from stats_engine import StatisticsEngine, parse_period, parse_year
+
+GAZETTEER = {
+    'Kayar': Place('Kayar', 'site', 'Thiès', None, None),
+    'Mbour': Place('Mbour', 'site', 'Thiès', None, None),
+    'Dakar': Place('Dakar', 'region', 'Dakar', None, None),
+}
+
+
+@pytest.fixture
+def engine():
+    landings = [{'region': region, 'mois': month, 'tonnes': tonnes}
+                for region, tonnes in (('Thiès', 100), ('Dakar', 40))
+                for month in ('janvier', 'février', 'mars', 'avril')]
+    captures = pd.DataFrame({
+        'date': ['2024-11-01', '2024-11-02', '2024-11-03'],
+        'zone': ['Dakar', 'Mbour', 'Dakar'],
+        'espece': ['Thiof', 'Pageot', 'Thiof'],
+        'quantite_kg': [10, 20, 30],
+        'prix_unitaire_fcfa': [1000, 500, 1000],
+    })
+    return StatisticsEngine({
+        'rapport.json': {'type': 'json', 'content': {'metadata': {'annee': 2019},
+                                                     'artisanale_debarquements_region_mois': landings}},
+        'captures.csv': {'type': 'csv', 'content': captures},
+    })
+
+
+def analysis(cities, comparison=False):
+    return {'cities': cities, 'needs_statistics': True, 'needs_species': False, 'needs_comparison': comparison}
+
+
+@pytest.mark.parametrize("question, months, label", [
+    ("Débarquements de janvier à mars à Dakar", [1, 2, 3], "janvier à mars"),
+    ("Captures entre janvier et avril", [1, 2, 3, 4], "janvier à avril"),
+    ("Prix du 1er janvier au 31 mars", [1, 2, 3], "janvier à mars"),
+    ("Débarquements de janvier jusqu'à mars", [1, 2, 3], "janvier à mars"),
+    ("Débarquements de mars à janvier", [1, 2, 3], "janvier à mars"),
+])
+def test_range_when_connective_between_months(question, months, label):
+    assert parse_period(question) == (months, label)
+
+
+@pytest.mark.parametrize("question, months, label", [
+    ("Débarquements janvier et mars à Dakar", [1, 3], "janvier, mars"),
+    ("Captures en janvier à Dakar et en mars à Mbour", [1, 3], "janvier, mars"),
+    ("Débarquements en juin à Mbour", [6], "juin"),
+])
+def test_discrete_months(question, months, label):
+    assert parse_period(question) == (months, label)
+
+
+def test_quarter_and_half():
+    assert parse_period("Captures du premier trimestre") == ([1, 2, 3], "T1")
+    assert parse_period("Captures du 2e semestre") == ([7, 8, 9, 10, 11, 12], "S2")
+
+
+def test_no_period():
+    assert parse_period("Prix du thiof à Mbour") == (None, None)
+
+
+def test_year():
+    assert parse_year("Débarquements du premier trimestre 2019") == 2019
+    assert parse_year("Débarquements de 150 tonnes") is None
+
+
+def test_sites_of_one_region_share_a_single_regional_total(engine):
+    context = engine.landings_context("Débarquements à Kayar et Mbour en janvier", analysis(['Kayar', 'Mbour']), GAZETTEER)
+    assert context.count("100 t") == 2  # total régional et détail de janvier, une seule fois
+    assert "Région de Thiès (total régional, sites cités: Kayar, Mbour)" in context
+    assert "Aucun chiffre par site" in context
+
+
+def test_region_cited_directly_has_no_site_note(engine):
+    context = engine.landings_context("Débarquements à Dakar", analysis(['Dakar']), GAZETTEER)
+    assert "Région de Dakar (total régional): 160 t" in context
+    assert "Aucun chiffre par site" not in context
+
+
+def test_captures_follow_the_requested_period(engine):
+    november = engine.captures_context("Captures de thiof à Dakar en novembre 2024", analysis(['Dakar']))
+    assert "du 01/11/2024 au 03/11/2024" in november
+    assert "Total: 40 kg" in november
+    assert engine.captures_context("Captures du premier trimestre 2019", analysis([])) == ""
+    assert engine.captures_context("Captures en mars", analysis([])) == ""
+    assert engine.captures_context("Captures en 2019", analysis([])) == ""
+
+
+def test_period_not_covered_keeps_only_landings(engine):
+    context, used = engine.answer("Débarquements à Dakar au premier trimestre 2019", analysis(['Dakar']), GAZETTEER)
+    assert used == {'rapport.json'}
+    assert "Captures" not in context
@@ -0,0 +1,75 @@
+"""
+File d'écriture différée: ordre des lots et attente de flush() limitée aux messages déjà en file
+(base simulée, sans PostgreSQL)
+Fichier: tests/test_write_queue.py
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from database import MessageWriteQueue
+
+
+class FakeDB:
+    """Base simulée: chaque lot prend `delay` secondes"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.rows = []
+
+    def insert_messages(self, rows):
+        time.sleep(self.delay)
+        self.rows.extend(rows)
+        return True
+
+
+def test_flush_waits_for_earlier_messages_only():
+    db = FakeDB(0.1)
+    write_queue = MessageWriteQueue(db, batch_size=1, flush_interval=0.05, flush_timeout=2)
+    stop = threading.Event()
+
+    def other_sessions():
+        while not stop.is_set():
+            write_queue.put(2, 'autre', 'user', 'charge')
+            time.sleep(0.02)
+
+    try:
+        assert write_queue.put(1, 'moi', 'user', 'mien')
+        producer = threading.Thread(target=other_sessions)
+        producer.start()
+        time.sleep(0.05)
+        start = time.monotonic()
+        assert write_queue.flush()
+        assert time.monotonic() - start < 1
+        assert (1, 'moi', 'user', 'mien', None) in db.rows
+    finally:
+        stop.set()
+        producer.join()
+        write_queue.close()
+
+
+def test_flush_times_out_when_writes_are_stuck():
+    write_queue = MessageWriteQueue(FakeDB(1.0), flush_interval=0.05)
+    try:
+        write_queue.put(1, 'moi', 'user', 'lent')
+        start = time.monotonic()
+        assert not write_queue.flush(timeout=0.2)
+        assert time.monotonic() - start < 0.5
+    finally:
+        write_queue.close()
+
+
+def test_rows_written_in_queue_order():
+    db = FakeDB(0)
+    write_queue = MessageWriteQueue(db, batch_size=3, flush_interval=0.05)
+    try:
+        for i in range(10):
+            write_queue.put(1, 'moi', 'user', str(i))
+        assert write_queue.flush()
+        assert [row[3] for row in db.rows] == [str(i) for i in range(10)]
+    finally:
+        write_queue.close()